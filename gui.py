@@ -5,15 +5,21 @@ GUI for MediaGrapher
 
 import sys
 import os
-# import subprocess
+import codecs
+import json
+import re
+from typing import TYPE_CHECKING
 
-# NOTE: Some imports are for commented out code (Settings Window)
-from PyQt6 import QtGui
-from PyQt6.QtCore import Qt, QProcess, QSettings
-from PyQt6.QtGui import QAction, QCursor
+from PyQt6.QtCore import Qt, QProcess, QProcessEnvironment, QSettings, QSignalBlocker, QTimer, pyqtSlot
+from PyQt6.QtGui import QAction, QCursor, QTextCursor
 from PyQt6.QtWidgets import (QHBoxLayout, QComboBox, QLineEdit, QTextEdit, QApplication, QLabel, QMainWindow,
                              QPushButton, QVBoxLayout, QWidget)
 from superqt import QLabeledRangeSlider
+from mediagrapher.cpu import MAX_THREADS
+
+# Only needed for the type annotations of the event handlers
+if TYPE_CHECKING:
+    from PyQt6.QtGui import QCloseEvent, QResizeEvent
 
 # Setting Window (Additional Imports)
 # from PyQt6 import QtWidgets
@@ -21,7 +27,51 @@ from superqt import QLabeledRangeSlider
 # from PyQt6.QtWidgets import (QMenu, QDialog, QRadioButton, QDialogButtonBox, QGroupBox)
 
 ALLOWED_ALGORITHMS = ["Canny", "Sobel"]
-MAX_THREADS = os.cpu_count()
+THREAD_CHOICES = tuple(str(i) for i in range(1, MAX_THREADS + 1))
+OUTPUT_FLUSH_INTERVAL = 50  # milliseconds
+RESIZE_SETTLE_INTERVAL = 50  # milliseconds
+WORKER_TERMINATE_TIMEOUT = 10000  # milliseconds, for the worker to clean up the job it is running
+MAX_TERMINAL_LINES = 2000
+URL_RE = re.compile(r"^https?://\S+$")
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+WORKER_ARGUMENTS = ["mediagrapher.py", "--server"]
+# Environment variables of the GUI left out of the environment of the worker process: shell display settings that
+# only add to the environment it parses at startup, and Python options meant for interactive sessions.
+# Everything else is passed on, as the worker and its ffmpeg processes rely on platform, locale, display and proxy
+# variables that cannot all be listed here.
+WORKER_ENVIRONMENT_EXCLUDED_KEYS = ("LS_COLORS", "PS1", "PROMPT_COMMAND", "PYTHONINSPECT", "PYTHONSTARTUP")
+
+
+def physical_cores() -> int:
+    """
+    Returns the number of physical CPU cores, or MAX_THREADS if it cannot be determined.
+
+    The edge detection and tracing of every frame is CPU-bound, so running more workers than
+    physical cores only makes hyperthreads compete for the same execution units.
+    """
+    try:
+        import psutil  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return MAX_THREADS
+    return min(psutil.cpu_count(logical=False) or MAX_THREADS, MAX_THREADS)
+
+
+def worker_environment() -> QProcessEnvironment:
+    """
+    Returns the environment of the worker process.
+
+    It is the environment of the GUI, without the variables in WORKER_ENVIRONMENT_EXCLUDED_KEYS.
+    """
+    environment = QProcessEnvironment.systemEnvironment()
+    for key in WORKER_ENVIRONMENT_EXCLUDED_KEYS:
+        environment.remove(key)
+    return environment
+
+
+DEFAULT_THREADS = physical_cores()
+
+# Shared by every read and write of the settings, instead of opening the settings storage each time
+SETTINGS = QSettings('MediaGrapher', 'MediaGrapher')
 
 
 class MainWindow(QMainWindow):
@@ -32,9 +82,6 @@ class MainWindow(QMainWindow):
     and provides the user interface for the application. The main window contains various UI elements such as
     menus, input fields, buttons, and a terminal output area.
 
-    Attributes:
-        setting_geometry (QSettings): The QSettings object for storing and retrieving window size settings.
-
     Methods:
         __init__(): Initializes the MainWindow object.
         get_setting_values(): Retrieves the saved settings for the application window.
@@ -44,12 +91,40 @@ class MainWindow(QMainWindow):
         thresholds_parameter(): Initializes the thresholds parameter UI element.
         init_input_field(): Initializes the input field UI elements.
         init_script_button(): Initializes the script execution button.
-        terminal_output(): Displays the terminal output in the UI.
-        run_script(): Executes the script with the provided input and parameters.
-        resize_event(): Handles the resize event of the main window.
-        close_event(): Handles the close event of the main window.
+        init_terminal(): Initializes the terminal output area.
+        buffer_output(): Buffers the output of the worker process until the next flush.
+        terminal_output(): Displays the buffered terminal output in the UI.
+        worker_event(): Handles a job status line written by the worker process.
+        enable_run_button(): Enables the script execution button.
+        disable_run_button(): Disables the script execution button.
+        start_worker(): Starts the worker process that runs the jobs.
+        stop_worker(): Stops the worker process.
+        run_script(): Sends a job with the provided input and parameters to the worker process.
+        resizeEvent(): Handles the resize event of the main window.
+        resize_settled(): Restores the cursor once the main window has stopped resizing.
+        closeEvent(): Handles the close event of the main window.
     """
 
+    # Attributes created by the init_* methods
+    layout: QVBoxLayout
+    process: QProcess
+    output_buffer: bytearray
+    output_decoder: codecs.IncrementalDecoder
+    worker_output: str
+    flush_timer: QTimer
+    resize_timer: QTimer
+    algo_combo_box: QComboBox
+    threshold_slider: QLabeledRangeSlider
+    threads_combo_box: QComboBox
+    input_box: QHBoxLayout
+    input_label: QLabel
+    input_field: QLineEdit
+    output_box: QHBoxLayout
+    output_label: QLabel
+    output_file_name: QLineEdit
+    run_script_button: QPushButton
+    terminal_results: QTextEdit
+
     def __init__(self):
         super().__init__()
         self.init_ui()
@@ -59,23 +134,25 @@ class MainWindow(QMainWindow):
         """
         This method retrieves the saved settings for the application window.
 
-        It fetches the window size from the QSettings object and restores the window geometry
-        to the saved state. The settings are stored with the organization name 'MediaGrapher'
-        and the application name 'Window Size'.
+        It fetches the window size from the SETTINGS object and, if one was saved, restores the window
+        geometry to the saved state. The settings are stored with the organization name 'MediaGrapher'
+        and the application name 'MediaGrapher'.
 
-        Note: Currently, the method only handles window size. In the future, it may be extended
-        to handle additional parameters.
+        It also fetches the maximum number of lines kept in the terminal output from the
+        'Terminal Lines' key (default: MAX_TERMINAL_LINES).
         """
-        self.setting_geometry = QSettings('MediaGrapher', 'Window Size')
-        self.restoreGeometry(self.setting_geometry.value('Window Size'))
+        geometry = SETTINGS.value('Window Size')
+        if geometry is not None:
+            self.restoreGeometry(geometry)
 
-        # self.setting_parameters = QSettings('MediaGrapher', 'Parameters')
+        self.terminal_results.document().setMaximumBlockCount(
+            SETTINGS.value('Terminal Lines', MAX_TERMINAL_LINES, type=int))
 
     def init_ui(self):
         """
         Initializes the user interface for the MediaGrapher application.
         Sets the window title, creates the central widget, and sets up the layout.
-        Connects the QProcess readyRead signal to the terminal_output slot.
+        Connects the QProcess readyRead signal to the buffer_output slot, and the flush timer to terminal_output.
         Initializes the menu, algorithm parameters, thresholds parameter, input field, and script button.
         Creates a QTextEdit widget for terminal results and displays the window.
         """
@@ -87,7 +164,29 @@ class MainWindow(QMainWindow):
         self.layout = QVBoxLayout(central)
 
         self.process = QProcess(self)
-        self.process.readyRead.connect(self.terminal_output)
+        # Progress bars and errors are written to stderr, read them through the same channel as stdout
+        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        self.process.readyRead.connect(self.buffer_output)
+        self.process.setProcessEnvironment(worker_environment())
+        self.process.setWorkingDirectory(SCRIPT_DIRECTORY)
+        # The button is disabled while a job runs (see worker_event), enable it again if the worker exits mid-job
+        self.process.finished.connect(self.enable_run_button)
+        self.output_buffer = bytearray()
+        # Keeps the bytes of a character that is split between two reads until the rest arrives
+        self.output_decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.worker_output = ""
+
+        # Output is flushed to the terminal at most once per interval instead of once per read
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(OUTPUT_FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.terminal_output)
+
+        # Resize events are coalesced into one resize_settled() call once the window stops resizing
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(RESIZE_SETTLE_INTERVAL)
+        self.resize_timer.timeout.connect(self.resize_settled)
 
         self.init_menu()
         self.algorithm_parameters()
@@ -96,9 +195,10 @@ class MainWindow(QMainWindow):
         self.init_input_field()
         self.init_script_button()
 
-        self.terminal_results = QTextEdit()
-        self.terminal_output()
+        self.init_terminal()
 
+        self.start_worker()
+        QApplication.instance().aboutToQuit.connect(self.stop_worker)
         self.show()
 
     # NOTE: Uncomment code in this function to add a Settings Window in Menu Bar
@@ -108,7 +208,8 @@ class MainWindow(QMainWindow):
         """
 
         # NOTE: Uncomment to add a Settings Window to Menu Bar
-        # self.w = settingWindow()
+        # The Settings Window is only created the first time it is shown, see show_settingWindow()
+        # self.w = None
         # setParametersAct = QAction('&Set Parameters', self)
         # setParametersAct.setShortcut('Ctrl+P')
         # setParametersAct.triggered.connect(self.show_settingWindow)
@@ -129,7 +230,9 @@ class MainWindow(QMainWindow):
 
     # NOTE:Uncomment to show a Settings Window
     # def show_settingWindow(self, checked):
-    #     #Shows Setting Window
+    #     #Shows Setting Window, creating it on first use
+    #     if self.w is None:
+    #         self.w = settingWindow()
     #     self.w.show()
 
     def algorithm_parameters(self):
@@ -146,7 +249,8 @@ class MainWindow(QMainWindow):
             None
         """
         self.algo_combo_box = QComboBox() #QCompleter can be used if there ends up being a lot of algorithms to select from.
-        self.algo_combo_box.addItems(ALLOWED_ALGORITHMS)
+        with QSignalBlocker(self.algo_combo_box):
+            self.algo_combo_box.addItems(ALLOWED_ALGORITHMS)
         algo_label = QLabel("Algorithm: ")
         algo_label.setBuddy(self.algo_combo_box)
         algo_layout = QHBoxLayout()
@@ -169,16 +273,15 @@ class MainWindow(QMainWindow):
         threshold_label = QLabel("Set Algorithm Thresholds: ")
         threshold_layout = QHBoxLayout()
         self.threshold_slider = QLabeledRangeSlider(Qt.Orientation.Horizontal)
-        self.threshold_slider.setRange(0, 255)
-        self.threshold_slider.setSliderPosition((30, 150))
-        self.threshold_slider.setTickInterval(10)
+        # Nothing is connected yet, the change signals emitted during setup would only be wasted
+        with QSignalBlocker(self.threshold_slider):
+            self.threshold_slider.setRange(0, 255)
+            self.threshold_slider.setSliderPosition((30, 150))
+            self.threshold_slider.setTickInterval(10)
         threshold_label.setBuddy(self.threshold_slider)
         threshold_layout.addWidget(threshold_label)
         threshold_layout.addWidget(self.threshold_slider)
 
-        self.threshold = [str(value)
-                          for value in self.threshold_slider.value()]
-
         self.layout.addLayout(threshold_layout)
 
     def threads_parameter(self):
@@ -187,7 +290,7 @@ class MainWindow(QMainWindow):
 
         This method creates a QComboBox widget that allows the user to select the number of CPU threads to be used.
         The available options range from 1 to MAX_THREADS.
-        The default choice is set to MAX_THREADS.
+        The default choice is set to DEFAULT_THREADS, the number of physical CPU cores.
         The widget is added to the layout of the GUI.
 
         Parameters:
@@ -197,10 +300,10 @@ class MainWindow(QMainWindow):
             None
         """
         self.threads_combo_box = QComboBox()
-        self.threads_combo_box.addItems(
-            [str(i) for i in range(1, MAX_THREADS+1)])
-        self.threads_combo_box.setCurrentIndex(
-            MAX_THREADS-1)  # Set default choice to MAX_THREADS
+        with QSignalBlocker(self.threads_combo_box):
+            self.threads_combo_box.addItems(THREAD_CHOICES)
+            self.threads_combo_box.setCurrentIndex(
+                DEFAULT_THREADS-1)  # Set default choice to DEFAULT_THREADS
         threads_label = QLabel("Number of CPU Threads: ")
         threads_label.setBuddy(self.threads_combo_box)
         threads_layout = QHBoxLayout()
@@ -251,80 +354,199 @@ class MainWindow(QMainWindow):
         self.run_script_button.setShortcut("Return")
         self.layout.addWidget(self.run_script_button)
 
-    def terminal_output(self):
+    def init_terminal(self):
         """
-        Display the output of the terminal process in the GUI.
+        Initializes the read-only QTextEdit widget that displays the output of the worker process.
+
+        The oldest lines are dropped once the output exceeds MAX_TERMINAL_LINES, so that memory usage
+        and the cost of appending output stay bounded on long runs.
         """
+        self.terminal_results = QTextEdit()
         self.terminal_results.setPlaceholderText("Terminal Results")
         self.terminal_results.setReadOnly(True)
+        self.terminal_results.document().setMaximumBlockCount(MAX_TERMINAL_LINES)
+        self.layout.addWidget(self.terminal_results)
+
+    @pyqtSlot()
+    def buffer_output(self):
+        """
+        Buffers the output of the worker process, and schedules a flush to the terminal if none is pending.
+        """
+        self.output_buffer += self.process.readAll().data()
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    @pyqtSlot()
+    def terminal_output(self):
+        """
+        Display the buffered output of the worker process in the GUI.
+
+        Job status lines written by the worker are not displayed, they are handled by worker_event().
+        """
+        if not self.output_buffer:
+            return
+
+        text = self.worker_output + self.output_decoder.decode(self.output_buffer)
+        self.output_buffer.clear()
+        head, newline, tail = text.rpartition("\n")
+        if tail.startswith("{"):
+            # The last line may be a job status line that is not complete yet
+            text, self.worker_output = head + newline, tail
+        else:
+            self.worker_output = ""
+
+        self.terminal_results.moveCursor(QTextCursor.MoveOperation.End)
         self.terminal_results.insertPlainText(
-            self.process.readAll().data().decode())
+            "".join(line for line in text.splitlines(keepends=True) if not self.worker_event(line)))
         self.terminal_results.ensureCursorVisible()
-        self.layout.addWidget(self.terminal_results)
 
+    def worker_event(self, line: str) -> bool:
+        """
+        Handles a job status line written by the worker process (see serve() in mediagrapher.py).
+
+        Disables the 'run_script_button' when a job starts and enables it when the job finishes,
+        to prevent accidentally running multiple jobs at once.
+
+        Args:
+            line (str): A line of the worker output.
+
+        Returns:
+            bool: True if the line was a job status line, False otherwise.
+        """
+        if not line.startswith("{"):
+            return False
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(event, dict):
+            return False
+
+        match event.get("event"):
+            case "started":
+                self.disable_run_button()
+            case "finished":
+                self.enable_run_button()
+            case _:
+                return False
+        return True
+
+    @pyqtSlot()
+    def enable_run_button(self):
+        """
+        Enables the 'run_script_button'.
+        """
+        self.run_script_button.setEnabled(True)
+
+    @pyqtSlot()
+    def disable_run_button(self):
+        """
+        Disables the 'run_script_button'.
+        """
+        self.run_script_button.setEnabled(False)
+
+    def start_worker(self):
+        """
+        Starts the worker process that runs the 'mediagrapher.py' jobs sent by run_script().
+
+        The worker is started once and kept alive, so that each job does not pay for
+        interpreter startup and the heavy imports of 'mediagrapher.py' again.
+        """
+        self.output_decoder.reset()
+        self.process.start(sys.executable, WORKER_ARGUMENTS)
+
+    @pyqtSlot()
+    def stop_worker(self):
+        """
+        Stops the worker process by closing its stdin, terminating it if it is still running a job.
+
+        A terminated worker stops its pool workers and ffmpeg processes, and releases its shared memory, before
+        exiting (see serve() in mediagrapher.py). It is only killed if it has not exited after
+        WORKER_TERMINATE_TIMEOUT, or cannot be terminated, like console processes on Windows.
+        """
+        self.process.closeWriteChannel()
+        if not self.process.waitForFinished(1000):
+            self.process.terminate()
+            if not self.process.waitForFinished(WORKER_TERMINATE_TIMEOUT):
+                self.process.kill()
+                self.process.waitForFinished()
+
+    @pyqtSlot()
     def run_script(self):
         """
-        Executes the script by starting a subprocess to run the 'mediagrapher.py' script with the specified arguments.
-        Disables the 'run_script_button' while the process is running and enables it when the process finishes.
+        Sends a job with the specified arguments to the 'mediagrapher.py' worker process,
+        restarting the worker first if it is not running.
         """
+        url = self.input_field.text().strip()
+        if not URL_RE.match(url):
+            # Rejected here, instead of sending a job that the worker can only fail
+            self.terminal_results.moveCursor(QTextCursor.MoveOperation.End)
+            self.terminal_results.insertPlainText(f"Invalid URL: {url!r}\n")
+            self.terminal_results.ensureCursorVisible()
+            return
+
         try:
-            output_flag = ["-o", self.output_file_name.text()
-                           ] if self.output_file_name.text() else []
-            algo_flag = ["-a", self.algo_combo_box.currentText()
-                         ] if self.algo_combo_box.currentText() else []
-            threshold_flag = ["-t", self.threshold[0],
-                              self.threshold[1]] if self.threshold else []
-            threads_flag = ["-p", self.threads_combo_box.currentText()
-                            ] if self.threads_combo_box.currentText() else []
-
-            # subprocess.run(["python", "mediagrapher.py", self.input_field.text()]+ output_flag + algo_flag + threshold_flag + threads_flag)
-            self.process.start("python", ["mediagrapher.py", self.input_field.text(
-            )] + output_flag + algo_flag + threshold_flag + threads_flag)
-
-            # Just to prevent accidentally running multiple times
-            # Disable the button when process starts, and enable it when it finishes
-            self.process.started.connect(
-                lambda: self.run_script_button.setEnabled(False))
-            self.process.finished.connect(
-                lambda: self.run_script_button.setEnabled(True))
+            # Only the file name is kept, so the output cannot be written outside of the "output" directory
+            output_name = os.path.basename(self.output_file_name.text().strip())
+            # Read the thresholds when the job is sent, so that they match the current slider position
+            low_threshold, high_threshold = self.threshold_slider.value()
+            # The combo box indices map directly to ALLOWED_ALGORITHMS and to the thread counts 1..MAX_THREADS
+            job = {"url": url,
+                   "algorithm": ALLOWED_ALGORITHMS[self.algo_combo_box.currentIndex()],
+                   "thresholds": [low_threshold, high_threshold],
+                   "threads": self.threads_combo_box.currentIndex() + 1}
+            if output_name:
+                job["output"] = output_name
+
+            if self.process.state() == QProcess.ProcessState.NotRunning:
+                self.start_worker()
+            self.process.write((json.dumps(job) + "\n").encode())
+            # Disabled now rather than when the worker reports the job started, so a double click sends one job
+            self.disable_run_button()
 
         except ValueError as e:
             print(f"Error running script: {e}")
 
-    # NOTE: Function not in use, and not working
-    # pylint: disable=unused-argument
-    def resize_event(self, event: QtGui.QResizeEvent) -> None:
+    def resizeEvent(self, event: "QResizeEvent") -> None:  # pylint: disable=invalid-name
         """
         Event handler for resizing the window.
 
+        Resize events arrive many times per second while the window is dragged, so the only work done
+        here is restarting resize_timer. The resize cursor is set on the first event, and resize_settled()
+        runs once the events have stopped for RESIZE_SETTLE_INTERVAL.
+
         Args:
-            event (QtGui.QResizeEvent): The resize event object.
+            event (QResizeEvent): The resize event object.
 
         Returns:
             None
         """
-        # Doesn't change cursor yet
-        # QApplication.setOverrideCursor(Qt.CursorShape.BusyCursor)
-        # changes cursor, but doesn't work here or when resetting
-        self.setCursor(Qt.CursorShape.SizeBDiagCursor)
+        if not self.resize_timer.isActive():
+            self.setCursor(Qt.CursorShape.SizeBDiagCursor)
+        self.resize_timer.start()
+        super().resizeEvent(event)
 
-        # QMainWindow.resizeEvent(self, event)
+    @pyqtSlot()
+    def resize_settled(self):
+        """
+        Restores the cursor once the window has stopped resizing.
+        """
+        self.unsetCursor()
 
-    # pylint: disable=unused-argument
-    def close_event(self, _event: QtGui.QCloseEvent) -> None:
+    def closeEvent(self, event: "QCloseEvent") -> None:  # pylint: disable=invalid-name
         """
         Event handler for the close event of the window.
 
-        Saves the window size when the program is closed.
+        Saves the window size when the program is closed, in the SETTINGS shared with get_setting_values().
 
         Args:
-            event (QtGui.QCloseEvent): The close event object.
+            event (QCloseEvent): The close event object.
 
         Returns:
             None
         """
-        self.setting_geometry = QSettings('MediaGrapher', 'Window Size').setValue(
-            'Window Size', self.saveGeometry())
+        SETTINGS.setValue('Window Size', self.saveGeometry())
+        super().closeEvent(event)
 
 
 # NOTE: Uncomment below to add a Settings Window
@@ -358,6 +580,9 @@ class MainWindow(QMainWindow):
 
 # Create the app, the main window, and run the app
 if __name__ == "__main__":
+    # Both have to be set before the QApplication is created
+    QApplication.setHighDpiScaleFactorRoundingPolicy(Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_DontCreateNativeWidgetSiblings)
     app = QApplication(sys.argv)
     window = MainWindow()
     app.exec()
@@ -3,40 +3,38 @@ Main Program
 """
 
 import os
+import sys
+import signal
+import atexit
+import json
 import argparse
-import glob
+import shutil
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import cv2
+import matplotlib
 import yt_dlp
 import ffmpeg
-from tqdm import trange
-from joblib import Parallel, delayed
+from tqdm import tqdm
+from mediagrapher.cpu import MAX_THREADS
 from mediagrapher.curves import Curves
 from mediagrapher.media.image import ImageMedia
 from mediagrapher.grapher.matplotlib_grapher import MatplotlibGrapher
 
 ALLOWED_ALGORITHMS = ["Canny", "Sobel"]
-MAX_THREADS = os.cpu_count()
-
-# Argument Parser
-parser = argparse.ArgumentParser(
-    prog="MediaGrapher",
-    description="Command-line interface for graphing images and videos.")
-
-parser.add_argument('url', type=str, help="URL of the image.")
-parser.add_argument('-o', '--output', type=str,
-                    default="output", help="Output file name.")
-parser.add_argument('-a', '--algorithm', type=str,
-                    choices=ALLOWED_ALGORITHMS, default="Canny", help="Edge detection algorithm.")
-parser.add_argument('-t', '--thresholds', type=int, nargs=2, default=(30, 200), metavar=('LOW', 'HIGH'),
-                    help="Thresholds for the Canny edge detection algorithm. (default: 30, 200)")
-parser.add_argument('-p', '--threads', type=int, choices=range(1, MAX_THREADS+1), default=MAX_THREADS,
-                    help="Number of threads utilized on the CPU. (default: MAX_THREADS)")
-args = parser.parse_args()
-
-URL = args.url
-OUTPUT = args.output
-ALGORITHM = args.algorithm
-THRESHOLDS = args.thresholds
-THREADS = args.threads
+MAX_RESOLUTION = 1000  # pixels, on the largest side of the graphed image
+
+# Worker processes shared by every video, see get_pool()
+POOL = None
+POOL_THREADS = 0
+# Grapher reused by the images graphed in this process, see get_grapher()
+GRAPHER = None
+# Upper bound of the shared memory used for the decoded video frames
+MAX_FRAME_BUFFER_SIZE = 256 * 1024 * 1024  # bytes
+
 
 def get_media(url: str) -> tuple:
     """
@@ -50,7 +48,8 @@ def get_media(url: str) -> tuple:
                If the URL is invalid, it returns a tuple with the type 'error' and an error message.
     """
     try:
-        return ("image", ImageMedia(url=url))
+        # Every image is traced at a resolution that fits in MAX_RESOLUTION on both sides, see trace_image()
+        return ("image", ImageMedia(url=url, target_resolution=(MAX_RESOLUTION, MAX_RESOLUTION)))
     except ValueError:
         pass
     try:
@@ -68,6 +67,62 @@ def get_media(url: str) -> tuple:
         return ("error", "Invalid URL.")
 
 
+def get_grapher(resolution: tuple) -> MatplotlibGrapher:
+    """
+    Returns the grapher used to graph images of the given resolution.
+
+    Every frame of a video has the same resolution, so the grapher and its figure are created once per
+    process and reused for the following frames. It is only replaced when the resolution changes.
+
+    Args:
+        resolution (tuple): The resolution of the image.
+
+    Returns:
+        MatplotlibGrapher: The grapher.
+    """
+    global GRAPHER  # pylint: disable=global-statement
+    if GRAPHER is None or GRAPHER.resolution != resolution:
+        if GRAPHER is not None:
+            GRAPHER.close()
+        GRAPHER = MatplotlibGrapher("output", resolution)
+    return GRAPHER
+
+
+def fit_resolution(resolution: tuple) -> tuple:
+    """
+    Returns the resolution scaled down to the largest size that fits in MAX_RESOLUTION, keeping its aspect ratio.
+    This is the resolution ImageMedia.resize_to_max_dim() gives to the images traced by trace_image().
+
+    Args:
+        resolution (tuple): The resolution (width, height).
+
+    Returns:
+        tuple: The scaled resolution (width, height), or the resolution itself if it already fits.
+    """
+    largest_side = max(resolution)
+    if largest_side <= MAX_RESOLUTION:
+        return tuple(resolution)
+    scale = MAX_RESOLUTION / largest_side
+    return (int(resolution[0] * scale), int(resolution[1] * scale))
+
+
+def trace_image(image: ImageMedia, algorithm: str = "Canny", thresholds: tuple = (30, 150)) -> Curves:
+    """
+    Scales the image down to fit in MAX_RESOLUTION and traces the curves of its edges.
+
+    Args:
+        image (ImageMedia): The input image to be traced.
+        algorithm (str, optional): The algorithm to be used for processing the image. Defaults to "Canny".
+        thresholds (tuple, optional): The thresholds to be used for the algorithm. Defaults to (30, 150).
+
+    Returns:
+        Curves: The traced curves.
+    """
+    image.resize_to_max_dim(MAX_RESOLUTION)
+
+    return Curves(image, algorithm=algorithm, thresholds=thresholds)
+
+
 def process_image(image: ImageMedia, title: str, frame: int = 1, output: str = "output", algorithm: str = "Canny", thresholds: tuple = (30, 150)):
     """
     Process an image using the specified algorithm and save the resulting plot.
@@ -78,81 +133,232 @@ def process_image(image: ImageMedia, title: str, frame: int = 1, output: str = "
         output (str, optional): The output directory to save the plot. Defaults to "output".
         algorithm (str, optional): The algorithm to be used for processing the image. Defaults to "Canny".
         thresholds (tuple, optional): The thresholds to be used for the algorithm. Defaults to (30, 150).
+
+    The "output" directory must already exist.
     """
+    curves = trace_image(image, algorithm, thresholds)
+    grapher = get_grapher(image.resolution)
+    grapher.save_plot(frame, curves, "output", output, title)
 
-    while image.resolution[0] > 1000 or image.resolution[1] > 1000:
-        image.resize_scale(0.8)
 
-    curves = Curves(image, algorithm=algorithm, thresholds=thresholds)
-    grapher = MatplotlibGrapher(
-        output, (image.resolution[0], image.resolution[1]))
+def process_frame(frame: int, pixels: np.ndarray, output_filename: str) -> np.ndarray:
+    """
+    Process a single frame of a video.
 
-    os.makedirs("output", exist_ok=True)
-    os.makedirs(os.path.join("output", "frames"), exist_ok=True)
+    Args:
+        frame (int): The frame number to process.
+        pixels (np.ndarray): The RGB pixels of the frame.
+        output_filename (str): The title of the graph.
 
-    grapher.save_plot(frame, curves, "output", output, title)
+    Returns:
+        np.ndarray: The RGB pixels of the graphed frame.
+    """
+    image = ImageMedia(array=pixels)
+    curves = trace_image(image)
+    return get_grapher(image.resolution).render(frame, curves, output_filename)
 
 
-def process_frame(frame: int, frames_folder: str, output_filename: str):
+def process_frame_range(frame_range: range, shared_name: str, slot: int, shape: tuple, output_filename: str) -> list:
     """
-    Process a single frame of an image.
+    Process the frames in the given range.
+
+    Each call is a single task of the process pool, so that a whole range of frames crosses the
+    process boundary at once instead of one frame at a time. The pixels are not sent with the task,
+    they are read from the given slot of the shared memory filled by process_video().
 
     Args:
-        frame (int): The frame number to process.
-        frames_folder (str): The folder path where the frames are stored.
-        output_filename (str): The filename of the output image.
+        frame_range (range): The frame numbers to process.
+        shared_name (str): The name of the shared memory holding the frames.
+        slot (int): The slot of the shared memory holding the frames of this range.
+        shape (tuple): The shape (slots, frames per slot, height, width, 3) of the frames in the shared memory.
+        output_filename (str): The title of the graphs.
 
     Returns:
-        None
+        list: The RGB pixels of the graphed frames, in order.
     """
-    image = ImageMedia(filename=os.path.join(frames_folder, f"frame_{frame}.jpg"))
-    process_image(image, output_filename, frame=frame, output=os.path.join(
-        'frames', f"frame_{frame}"))
+    # Attached for this task only, so that the workers do not keep the memory of previous videos mapped
+    shared = SharedMemory(name=shared_name)
+    try:
+        frames = np.ndarray(shape, dtype=np.uint8, buffer=shared.buf)[slot]
+        return [process_frame(frame, frames[index], output_filename) for index, frame in enumerate(frame_range)]
+    finally:
+        # The memory can only be closed once no array uses it
+        frames = None
+        shared.close()
 
 
-def get_video_frames(video_path: str, output_folder: str):
+def read_video_frames(stream, frames: np.ndarray) -> int:
     """
-    Extracts frames from a video file and saves them as individual images.
+    Reads the next raw frames of a video stream into the given array, until it is full or the stream ends.
 
     Args:
-        video_path (str): The path to the video file.
-        output_folder (str): The folder where the extracted frames will be saved.
+        stream: The binary stream of raw frames.
+        frames (np.ndarray): The array the frames are read into, of shape (frames, height, width, 3).
 
     Returns:
-        None
+        int: The number of whole frames read.
     """
-    os.makedirs(output_folder, exist_ok=True)
+    buffer = memoryview(frames).cast('B')
+    read = 0
+    while read < len(buffer):
+        count = stream.readinto(buffer[read:])
+        if not count:
+            break
+        read += count
+    return read // (len(buffer) // len(frames))
 
-    (
+
+def stop_process(process):
+    """
+    Kills a process if it is still running, closes its pipes and waits for it to exit.
+
+    Args:
+        process (subprocess.Popen): The process, or None if it was not started.
+    """
+    if process is None:
+        return
+    if process.poll() is None:
+        process.kill()
+    for pipe in (process.stdin, process.stdout):
+        if pipe is not None:
+            pipe.close()
+    process.wait()
+
+
+def finish_video(decoder, encoder, video_path: str):
+    """
+    Waits for the ffmpeg processes of a video to exit, once every frame is decoded and written to the encoder.
+
+    Args:
+        decoder (subprocess.Popen): The ffmpeg process decoding the video, see get_video_decoder().
+        encoder (subprocess.Popen): The ffmpeg process encoding the graphed video, see get_video_encoder(),
+            or None if no frame was graphed.
+        video_path (str): The path to the input video file.
+
+    Raises:
+        ffmpeg.Error: If either process failed, its errors are written to stderr.
+        ValueError: If no frame could be decoded from the video.
+    """
+    if decoder.wait():
+        raise ffmpeg.Error('ffmpeg', None, None)
+    if encoder is None:
+        raise ValueError(f"No frame could be decoded from {video_path}")
+    # The end of the input of the encoder, which finishes the video file
+    encoder.stdin.close()
+    if encoder.wait():
+        raise ffmpeg.Error('ffmpeg', None, None)
+
+
+def write_graphed_frames(encoder, finished: dict, next_frame: int, free_slots: list) -> int:
+    """
+    Writes the graphed ranges that continue the video, starting at next_frame, to the encoder.
+
+    Ranges that complete before an earlier range are left in finished until the earlier range is written.
+    The slots of the written ranges are given back to free_slots.
+
+    Args:
+        encoder (subprocess.Popen): The ffmpeg process encoding the video, see get_video_encoder().
+        finished (dict): The graphed ranges that are not written yet, as (slot, graphed frames) by first frame.
+        next_frame (int): The first frame that is not written yet.
+        free_slots (list): The slots of the shared memory that can be refilled.
+
+    Returns:
+        int: The first frame that is not written yet, after writing.
+    """
+    while next_frame in finished:
+        slot, graphed = finished.pop(next_frame)
+        for graphed_frame in graphed:
+            encoder.stdin.write(graphed_frame)
+        next_frame += len(graphed)
+        free_slots.append(slot)
+    return next_frame
+
+
+def frame_buffer_shape(metadata: dict, threads: int) -> tuple:
+    """
+    Returns the shape of the shared memory holding the decoded frames of a video.
+
+    There are two slots per worker, so that a worker can start on its next range while the previous one is handed
+    over. Frames are sent as contiguous ranges to cut the inter-process overhead, a few per worker to balance the
+    load, as long as the slots fit in MAX_FRAME_BUFFER_SIZE. The frames are held at the resolution they are traced
+    at, see fit_resolution().
+
+    Args:
+        metadata (dict): The metadata of the video, see get_video_metadata().
+        threads (int): The number of worker processes.
+
+    Returns:
+        tuple: The shape (slots, frames per slot, height, width, 3).
+    """
+    width, height = fit_resolution((metadata['width'], metadata['height']))
+    slots = threads * 2
+    chunk = max(1, min(-(-metadata['total_frames'] // (threads * 4)), MAX_FRAME_BUFFER_SIZE // (slots * height * width * 3)))
+    return (slots, chunk, height, width, 3)
+
+
+def get_video_decoder(video_path: str, resolution: tuple):
+    """
+    Starts the ffmpeg process that decodes the frames of a video, scaled to the given resolution.
+
+    The frames are read from the stdout of the process as raw RGB pixels, in order.
+
+    Args:
+        video_path (str): The path to the input video file.
+        resolution (tuple): The resolution (width, height) of the frames.
+
+    Returns:
+        subprocess.Popen: The ffmpeg process.
+    """
+    return (
         ffmpeg.input(video_path)
-        .output(os.path.join(output_folder, 'frame_%d.jpg'), start_number=1)
-        .overwrite_output()
-        .run(quiet=True)
+        .output('pipe:', format='rawvideo', pix_fmt='rgb24', s=f'{resolution[0]}x{resolution[1]}')
+        .global_args('-loglevel', 'error')
+        .run_async(pipe_stdout=True)
     )
 
 
-def combine_video_frames(video_path: str, frames_folder: str, output_path: str, fps: int):
+def get_video_encoder(video_path: str, output_path: str, resolution: tuple, fps: float):
     """
-    Combines individual frames into a video file.
+    Starts the ffmpeg process that encodes the graphed frames into a video file, with the audio of the input video.
+
+    The frames are written to the stdin of the process as raw RGB pixels, in order.
 
     Args:
-        frames_folder (str): The folder containing the frames.
+        video_path (str): The path to the input video file, whose audio is copied.
         output_path (str): The path to the output video file.
-        fps (int): The frames per second of the video.
+        resolution (tuple): The resolution (width, height) of the frames.
+        fps (float): The frames per second of the video.
 
     Returns:
-        None
+        subprocess.Popen: The ffmpeg process.
     """
     audio = ffmpeg.input(video_path).audio
-    (
-        ffmpeg.input(os.path.join(
-            frames_folder, "frame_%d.png"), framerate=fps)
+    return (
+        ffmpeg.input('pipe:', format='rawvideo', pix_fmt='rgb24', s=f'{resolution[0]}x{resolution[1]}', framerate=fps)
         .output(audio, output_path)
         .overwrite_output()
-        .run(quiet=True)
+        .global_args('-loglevel', 'error')
+        .run_async(pipe_stdin=True)
     )
 
 
+def get_video_rotation(video_info: dict) -> int:
+    """
+    Returns the rotation of a video stream, which ffmpeg applies to its frames when decoding them.
+
+    Args:
+        video_info (dict): The video stream, as probed by ffprobe.
+
+    Returns:
+        int: The rotation in degrees, between 0 and 359.
+    """
+    # Recent versions of ffprobe report the display matrix of the stream, older ones a rotate tag
+    for side_data in video_info.get('side_data_list', []):
+        if 'rotation' in side_data:
+            return round(float(side_data['rotation'])) % 360
+    return round(float(video_info.get('tags', {}).get('rotate', 0))) % 360
+
+
 def get_video_metadata(video_path):
     """
     Retrieves metadata for a video file.
@@ -164,9 +370,11 @@ def get_video_metadata(video_path):
         dict: A dictionary containing the following metadata:
             - 'duration': The duration of the video in seconds (float).
             - 'fps': The frames per second of the video (int).
-            - 'width': The width of the video in pixels (int).
-            - 'height': The height of the video in pixels (int).
+            - 'width': The width of the video in pixels (int), as displayed.
+            - 'height': The height of the video in pixels (int), as displayed.
             - 'codec_name': The name of the video codec (str).
+            - 'total_frames': The number of frames of the video (int), estimated from the duration and
+              frame rate when the container does not record it.
 
     Raises:
         ffmpeg.Error: If an error occurs while probing the video file.
@@ -175,13 +383,21 @@ def get_video_metadata(video_path):
         probe = ffmpeg.probe(video_path)
         video_info = next(
             s for s in probe['streams'] if s['codec_type'] == 'video')
+        numerator, denominator = map(int, video_info['avg_frame_rate'].split('/'))
+        # Containers such as Matroska do not record the duration of their streams, only the overall one
+        duration = float(video_info.get('duration') or probe['format']['duration'])
+        fps = numerator / denominator
+        width, height = int(video_info['width']), int(video_info['height'])
+        # ffmpeg rotates the frames of videos recorded in portrait, such as by phones, when decoding them
+        if get_video_rotation(video_info) % 180 == 90:
+            width, height = height, width
         metadata = {
-            'duration': float(video_info['duration']),
-            'fps': int(video_info['avg_frame_rate'].split('/')[0]) / int(video_info['avg_frame_rate'].split('/')[1]),
-            'width': int(video_info['width']),
-            'height': int(video_info['height']),
+            'duration': duration,
+            'fps': fps,
+            'width': width,
+            'height': height,
             'codec_name': video_info['codec_name'],
-            'total_frames': video_info['nb_frames']
+            'total_frames': int(video_info.get('nb_frames') or round(duration * fps))
         }
         return metadata
     except ffmpeg.Error as e:
@@ -189,79 +405,285 @@ def get_video_metadata(video_path):
         return None
 
 
-def process_video(video_path: str, frames_folder: str, output_filename: str, threads: int):
+def check_opencv_build():
+    """
+    Warns once, when MediaGrapher starts, if the OpenCV build misses the optimizations of this CPU architecture:
+    Intel IPP on x86, NEON on ARM. See ImageMedia.simd_report().
+    """
+    report = ImageMedia.simd_report()
+    features = report["baseline"] + report["dispatched"]
+    match report["machine"].lower():
+        case "x86_64" | "amd64" | "i386" | "i686" if report["ipp"] is None:
+            print("Warning: OpenCV is built without Intel IPP, edge detection and resizing will be slower.")
+        case "aarch64" | "arm64" if "NEON" not in features:
+            print("Warning: OpenCV is built without NEON, edge detection and resizing will be slower.")
+
+
+def use_agg_backend():
+    """
+    Selects the Agg backend of Matplotlib, before any figure is created.
+
+    Graphs are only saved to files or rendered to arrays here, so the non-interactive Agg backend avoids starting
+    a GUI backend in this process. It is called by main() and by init_worker().
+    """
+    matplotlib.use('Agg')
+
+
+def init_worker():
+    """
+    Initializes a worker process of the pool, see get_pool().
+
+    Selects the Agg backend, and limits OpenCV to a single thread with its optimized code paths on. The pool already
+    runs one worker per thread, an OpenCV thread pool per worker would only compete with the other workers for
+    the same cores.
+    """
+    use_agg_backend()
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(1)
+
+
+def get_pool(threads: int) -> ProcessPoolExecutor:
+    """
+    Returns the process pool used to process video frames.
+
+    The pool is created on first use and kept for the following videos, so that the worker processes and
+    their imports are not started again for every video. It is only replaced when the number of threads changes.
+    Its workers are started right away, before the shared memory of a video is created, so that the forked workers
+    do not inherit a mapping of it for the rest of their life.
+
+    Args:
+        threads (int): The number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: The process pool.
+    """
+    global POOL, POOL_THREADS  # pylint: disable=global-statement
+    if POOL is None or POOL_THREADS != threads:
+        shutdown_pool()
+        # The workers share the resource tracker of this process, which releases the shared memory of a video only
+        # once, when it is unlinked here, instead of starting their own ones that would release it again on exit
+        resource_tracker.ensure_running()
+        POOL = ProcessPoolExecutor(max_workers=threads, initializer=init_worker)
+        POOL_THREADS = threads
+        wait([POOL.submit(int) for _ in range(threads)])
+    return POOL
+
+
+@atexit.register
+def shutdown_pool():
+    """
+    Shuts down the process pool, if it was created.
+    """
+    global POOL  # pylint: disable=global-statement
+    if POOL is not None:
+        POOL.shutdown()
+        POOL = None
+
+
+def process_video(video_path: str, output_filename: str, threads: int):
     """
     Process a video by extracting frames, applying image processing algorithms to each frame, and combining the processed frames into a new video.
 
+    The frames are decoded and scaled down by ffmpeg into a pipe, and read straight into the slots of a shared memory that the
+    pool workers read them from, instead of going through image files. The graphed frames are sent back by the
+    workers and written in order into the pipe of the ffmpeg encoder. A slot is refilled with the next range of
+    frames once its graphed frames are written, so only a few ranges of frames are held in memory at a time.
+    The frames are read by a background thread, so that decoding the next range goes on while the graphed
+    frames are being collected and encoded.
+
     Args:
         video_path (str): The path to the input video file.
-        frames_folder (str): The folder to store the extracted frames.
-        output_folder (str): The folder to store the output video and processed frames.
-        algorithm (str, optional): The image processing algorithm to apply to each frame. Defaults to "Canny".
-        thresholds (tuple, optional): The thresholds to be used by the image processing algorithm. Defaults to (30, 150).
+        output_filename (str): The name of the output video in the "output" directory, and the title of the graphs.
+        threads (int): The number of worker processes.
     """
     print(f"Utilizing {threads} threads...")
     print("Getting video metadata...")
     metadata = get_video_metadata(video_path)
-
-    print("Extracting frames...")
-    os.makedirs(frames_folder, exist_ok=True)
-    get_video_frames(video_path, frames_folder)
+    if metadata is None:
+        raise ValueError(f"Could not read the metadata of {video_path}")
 
     print("Processing frames...")
+    os.makedirs('output', exist_ok=True)
+
+    shape = frame_buffer_shape(metadata, threads)
+    pool = get_pool(threads)
+    shared = SharedMemory(create=True, size=int(np.prod(shape)))
+    reader = ThreadPoolExecutor(max_workers=1)
+    decoder = encoder = None
+    running = {}
+    try:
+        decoder = get_video_decoder(video_path, (shape[3], shape[2]))
+        frames = np.ndarray(shape, dtype=np.uint8, buffer=shared.buf)
+        free_slots = list(range(shape[0]))
+        # Graphed ranges that are waiting for the ranges before them to be written, by first frame
+        finished = {}
+        start = next_frame = 1
+        # The range being read by the reader thread, its slot, and whether the decoder has frames left
+        reading, reading_slot, more_frames = None, None, True
+        with tqdm(total=metadata['total_frames']) as progress:
+            while more_frames or reading or running:
+                if more_frames and reading is None and free_slots:
+                    reading_slot = free_slots.pop()
+                    reading = reader.submit(read_video_frames, decoder.stdout, frames[reading_slot])
+
+                done, _ = wait([*running, reading] if reading else running, return_when=FIRST_COMPLETED)
+                if reading in done:
+                    count = reading.result()
+                    reading, more_frames = None, count == shape[1]
+                    if count:
+                        future = pool.submit(process_frame_range, range(start, start + count), shared.name,
+                                             reading_slot, shape, output_filename)
+                        running[future] = (reading_slot, start)
+                        start += count
+
+                # Ranges are counted as they complete, whichever worker finishes first
+                for future in done & running.keys():
+                    slot, first = running.pop(future)
+                    finished[first] = (slot, future.result())
+                    progress.update(len(finished[first][1]))
+
+                if encoder is None and next_frame in finished:
+                    # The size of the graphs is only known once the first one is rendered
+                    encoder = get_video_encoder(video_path, os.path.join('output', f'{output_filename}.mp4'),
+                                                finished[next_frame][1][0].shape[1::-1], metadata['fps'])
+                next_frame = write_graphed_frames(encoder, finished, next_frame, free_slots)
+
+        finish_video(decoder, encoder, video_path)
+    finally:
+        # The workers and the reader must be done with the shared memory before it is released
+        for future in running:
+            future.cancel()
+        wait(running)
+        stop_process(decoder)
+        reader.shutdown()
+        stop_process(encoder)
+        frames = None
+        shared.unlink()
+        shared.close()
 
-    total_frames = int(metadata['total_frames'])
-    Parallel(n_jobs=threads)(delayed(process_frame)(frame, frames_folder, output_filename) for frame in trange(1, total_frames + 1))
-
-    print("Combining frames...")
-    combine_video_frames(video_path, os.path.join(
-        'output', 'frames'), os.path.join('output', f'{output_filename}.mp4'), metadata['fps'])
     print("Done.")
 
 
-def main():
+def run(url: str, output: str = "output", algorithm: str = "Canny", thresholds: tuple = (30, 200), threads: int = MAX_THREADS):
     """
-    This function is the entry point of the MediaGrapher application.
+    Downloads the media at the given URL and graphs it.
+    This is the entry point used by the command line and by every job of the worker, and can be called in-process.
     It performs the following steps:
-    1. Creates an ImageMedia object with a specified URL.
-    2. Resizes the image if its resolution is greater than 2000x2000.
-    3. Applies the Canny algorithm to detect edges in the image.
-    4. Creates a MatplotlibGrapher object with the image resolution.
-    5. Checks if the "output" directory exists, and if so, removes it.
-    6. Creates a new "output" directory.
-    7. Saves the plot with the specified title and file name in the "output" directory.
-
-    Note: This function assumes that the necessary modules and classes are imported.
-    """
+    1. Removes the files left in the "input" and "output/frames" directories by a previous job.
+    2. Downloads the media as an image, or as a video if it is not an image.
+    3. Graphs the image, or every frame of the video, and saves the result in the "output" directory.
 
-    input_frames = os.path.join("input", "frames")
-    output_frames = os.path.join("output", "frames")
-
-    os.makedirs(input_frames, exist_ok=True)
-    os.makedirs(output_frames, exist_ok=True)
+    Args:
+        url (str): The URL of the image or video.
+        output (str, optional): The output file name. Defaults to "output".
+        algorithm (str, optional): The edge detection algorithm. Defaults to "Canny".
+        thresholds (tuple, optional): The thresholds for the edge detection algorithm. Defaults to (30, 200).
+        threads (int, optional): The number of threads utilized on the CPU. Defaults to MAX_THREADS.
 
-    input_dir = glob.glob(os.path.join("input", "*.mp4"))
-    input_frames = glob.glob(os.path.join(input_frames, "*"))
-    output_frames = glob.glob(os.path.join(output_frames, "*"))
+    Returns:
+        bool: True if the media was graphed, False if it could not be retrieved.
+    """
 
-    for input_file in input_dir:
-        os.remove(input_file)
-    for input_frame in input_frames:
-        os.remove(input_frame)
-    for output_frame in output_frames:
-        os.remove(output_frame)
+    # The graphs of previous jobs in "output" are kept, only their intermediate files are removed
+    shutil.rmtree("input", ignore_errors=True)
+    shutil.rmtree(os.path.join("output", "frames"), ignore_errors=True)
+    os.makedirs("input", exist_ok=True)
+    os.makedirs("output", exist_ok=True)
 
-    media_type, media = get_media(URL)
+    media_type, media = get_media(url)
     if media_type == "image":
         print("Processing image...")
-        process_image(media, OUTPUT, 1, OUTPUT, ALGORITHM, THRESHOLDS)
+        process_image(media, output, 1, output, algorithm, tuple(thresholds))
         print("Done.")
     elif media_type == "video":
         print("Processing video...")
-        process_video(media, os.path.join("input", "frames"), OUTPUT, THREADS)
+        process_video(media, output, threads)
     else:
         print("Error: Could not process media.")
+        return False
+    return True
+
+
+def serve():
+    """
+    Runs MediaGrapher as a persistent worker, so that consecutive jobs do not pay for
+    interpreter startup and the heavy imports of this module again.
+
+    Each line read from stdin is one job: a JSON object whose keys are the arguments of run().
+    For every job, the worker writes exactly one {"event": "started"} line to stdout before running it,
+    and exactly one {"event": "finished", "ok": <bool>} line after it. Anything else written in between
+    is progress output of the job. The worker exits when stdin is closed, or when it is terminated, once the job
+    it is running is cleaned up.
+    """
+    # stdout is block-buffered when it is a pipe, flush it once per line so progress shows up as it happens
+    sys.stdout.reconfigure(line_buffering=True)
+    # Exits normally when terminated by the GUI, so that the job being run is cleaned up: its ffmpeg processes
+    # are stopped and its shared memory released by process_video(), and the pool is shut down by shutdown_pool()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        print(json.dumps({"event": "started"}), flush=True)
+        try:
+            ok = run(**json.loads(line))
+        except Exception:  # pylint: disable=broad-exception-caught
+            traceback.print_exc()
+            ok = False
+        print(json.dumps({"event": "finished", "ok": ok}), flush=True)
+
+
+def parse_arguments(argv: list = None) -> argparse.Namespace:
+    """
+    Parses the command-line arguments.
+
+    This is only done when the script is run, so that importing this module, as the pool workers may do,
+    does not depend on the command line of the process.
+
+    Args:
+        argv (list, optional): The arguments to parse. Defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="MediaGrapher",
+        description="Command-line interface for graphing images and videos.")
+
+    parser.add_argument('url', type=str, nargs='?', help="URL of the image.")
+    parser.add_argument('-o', '--output', type=str,
+                        default="output", help="Output file name.")
+    parser.add_argument('-a', '--algorithm', type=str,
+                        choices=ALLOWED_ALGORITHMS, default="Canny", help="Edge detection algorithm.")
+    parser.add_argument('-t', '--thresholds', type=int, nargs=2, default=(30, 200), metavar=('LOW', 'HIGH'),
+                        help="Thresholds for the Canny edge detection algorithm. (default: 30, 200)")
+    parser.add_argument('-p', '--threads', type=int, choices=range(1, MAX_THREADS+1), default=MAX_THREADS,
+                        help="Number of threads utilized on the CPU. (default: MAX_THREADS)")
+    parser.add_argument('-s', '--server', action='store_true',
+                        help="Run as a persistent worker that reads JSON jobs from stdin.")
+    args = parser.parse_args(argv)
+    if not (args.url or args.server):
+        parser.error("the following arguments are required: url")
+    return args
+
+
+def main(args: argparse.Namespace):
+    """
+    This function is the entry point of the MediaGrapher application.
+    It either graphs the media given on the command line, or runs as a worker for the GUI.
+
+    Args:
+        args (argparse.Namespace): The parsed command-line arguments, see parse_arguments().
+    """
+    use_agg_backend()
+    check_opencv_build()
+    if args.server:
+        serve()
+    else:
+        if not run(args.url, args.output, args.algorithm, args.thresholds, args.threads):
+            sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
+    main(parse_arguments())
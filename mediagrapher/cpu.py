@@ -0,0 +1,10 @@
+"""
+CPU Settings
+
+Kept free of heavy imports, so that the GUI can import it without loading the processing modules.
+"""
+
+import os
+
+# CPUs this process may run on (restricted by CPU sets in containers), os.cpu_count() can also be None
+MAX_THREADS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
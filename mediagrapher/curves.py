@@ -2,6 +2,7 @@
 Curves class
 """
 
+from functools import lru_cache
 from typing import List, Tuple
 import numpy as np
 import potrace
@@ -24,6 +25,9 @@ class Curves:
         __init__(self, media: Media, algorithm: str = "Canny"): Initializes the Curves object.
         get_segments(self) -> List[List[Tuple[float, float]]]: Returns a list of segments in the path.
         get_coordinates(self, linspace: int = 50) -> List[List[List[float]]]: Returns the coordinates of the curves in the path.
+        get_control_points(self) -> np.ndarray: Returns the control points of every segment, as cubic curves.
+        cubic_basis(linspace: int) -> np.ndarray: Returns the cubic Bernstein basis, computed once per linspace.
+        bezier_curves(self, basis: np.ndarray, control_points: np.ndarray) -> List[List[List[float]]]: Calculates Bezier curves of the same degree together.
         linear_bezier_curve(self, start_point: int, end_point: int, t: float) -> float: Calculates the linear Bezier curve.
         cubic_bezier_curve(self, start_point: int, end_point: int, c1: int, c2: int, t: float) -> float: Calculates the cubic Bezier curve.
     """
@@ -48,8 +52,11 @@ class Curves:
             case _:
                 raise ValueError("Invalid algorithm.")
 
-        for i, _ in enumerate(self.media):
-            self.media[i][self.media[i] > 1] = 1
+        # potrace reads the bitmap pixel by pixel, it is given one contiguous byte per pixel. The edge images are
+        # already contiguous uint8 arrays, which are not copied. bool arrays are not used, as potrace rejects them.
+        self.media = np.ascontiguousarray(self.media, dtype=np.uint8)
+        # Every edge pixel is set to 1 in a single pass over the whole image
+        np.minimum(self.media, 1, out=self.media)
 
         self.bitmap = potrace.Bitmap(self.media)
         self.path = self.bitmap.trace()
@@ -92,54 +99,80 @@ class Curves:
             List[List[List[float], List[float]]]: A list of coordinates for each curve segment in the path.
                 Each coordinate is represented as a list of x and y values.
         """
-        coordinates = []
+        # All the points are computed by a single matrix product with the cubic Bernstein basis, in float32 as
+        # the points are only plotted, which halves the size of the product
+        control_points = self.get_control_points().astype(np.float32)
+        coordinates = self.bezier_curves(self.cubic_basis(linspace), control_points)
+        return coordinates
 
-        for curve in self.path:
-            start_x, start_y = curve.start_point
-            start_x, start_y = [start_x] * linspace, [start_y] * linspace
+    def get_control_points(self) -> np.ndarray:
+        """
+        Returns the control points of every segment in the path, packed in a single array.
 
+        Each segment is packed as a cubic Bezier curve. Each line of a corner is packed as the cubic curve from its
+        start to its end point with control points at a third and two thirds of the line, which has the same
+        points as the line. The array can be handed as is to the callers that evaluate or draw the curves, instead
+        of lists growing one segment at a time.
+
+        Returns:
+            np.ndarray: The control points, of shape (number of segments, 4, 2), in path order.
+        """
+        segments, is_line = [], []
+        for curve in self.path:
+            start_point = curve.start_point
             for segment in curve:
+                end_point = segment.end_point
                 if segment.is_corner:
-                    c_x, c_y = segment.c
-                    end_x, end_y = segment.end_point
-
-                    c_x, c_y = [c_x] * linspace, [c_y] * linspace
-                    end_x, end_y = [end_x] * linspace, [end_y] * linspace
-
-                    t = np.linspace(0, 1, linspace)
-
-                    first_line_x = list(map(
-                        self.linear_bezier_curve, start_x, c_x, t))
-                    first_line_y = list(map(
-                        self.linear_bezier_curve, start_y, c_y, t))
-
-                    second_line_x = list(map(
-                        self.linear_bezier_curve, c_x, end_x, t))
-                    second_line_y = list(map(
-                        self.linear_bezier_curve, c_y, end_y, t))
+                    segments.append((start_point, start_point, segment.c, segment.c))
+                    segments.append((segment.c, segment.c, end_point, end_point))
+                    is_line += [True, True]
+                else:
+                    segments.append((start_point, segment.c1, segment.c2, end_point))
+                    is_line.append(False)
+                start_point = end_point
+
+        control_points = np.array(segments, dtype=float).reshape((-1, 4, 2))
+        lines = control_points[is_line]
+        lines[:, 1] = (2 * lines[:, 0] + lines[:, 3]) / 3
+        lines[:, 2] = (lines[:, 0] + 2 * lines[:, 3]) / 3
+        control_points[is_line] = lines
+        return control_points
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def cubic_basis(linspace: int) -> np.ndarray:
+        """
+        Returns the cubic Bernstein basis for the given number of points.
 
-                    coordinates.append([first_line_x, first_line_y])
-                    coordinates.append([second_line_x, second_line_y])
+        The basis only depends on linspace, so it is computed once and shared by every call with the same
+        linspace. It is read-only, as it is shared.
 
-                else:
-                    c1_x, c1_y = segment.c1
-                    c2_x, c2_y = segment.c2
-                    end_x, end_y = segment.end_point
+        Args:
+            linspace (int): The number of points to generate along each curve segment.
 
-                    c1_x, c1_y = [c1_x] * linspace, [c1_y] * linspace
-                    c2_x, c2_y = [c2_x] * linspace, [c2_y] * linspace
-                    end_x, end_y = [end_x] * linspace, [end_y] * linspace
+        Returns:
+            np.ndarray: The basis, of shape (linspace, 4), in float32.
+        """
+        t = np.linspace(0, 1, linspace, dtype=np.float32)
+        basis = np.stack([(1 - t) ** 3, 3 * (1 - t) ** 2 * t, 3 * (1 - t) * t ** 2, t ** 3], axis=1)
+        basis.flags.writeable = False
+        return basis
 
-                    t = np.linspace(0, 1, linspace)
+    def bezier_curves(self, basis: np.ndarray, control_points: np.ndarray) -> List[List[List[float]]]:
+        """
+        Returns the coordinates of Bezier curves of the same degree, computed together.
 
-                    curve_x = list(map(self.cubic_bezier_curve,
-                                       start_x, c1_x, c2_x, end_x, t))
-                    curve_y = list(map(self.cubic_bezier_curve,
-                                       start_y, c1_y, c2_y, end_y, t))
+        Args:
+            basis (np.ndarray): The Bernstein basis of the degree, of shape (linspace, number of control points).
+            control_points (np.ndarray): The control points of each curve, of shape
+                (number of curves, number of control points, 2).
 
-                    coordinates.append([curve_x, curve_y])
-                start_x, start_y = end_x, end_y
-        return coordinates
+        Returns:
+            List[List[List[float], List[float]]]: The x and y values of each curve.
+        """
+        # A single (linspace, control points) x (control points, curves * 2) product for every curve
+        values = basis @ control_points.transpose((1, 0, 2)).reshape((basis.shape[1], -1))
+        return values.reshape((basis.shape[0], -1, 2)).transpose((1, 2, 0)).tolist()
 
     def linear_bezier_curve(self, start_point: int, end_point: int, t: float) -> float:
         """
@@ -148,7 +181,7 @@ class Curves:
         Args:
             start_point (int): The start point.
             end_point (int): The end point.
-            t (float): The t value.
+            t (float): The t value, or an array of t values to get every point at once.
 
         Returns:
             int: The linear Bezier curve.
@@ -164,7 +197,7 @@ class Curves:
             end_point (int): The end point.
             c1 (int): The first control point.
             c2 (int): The second control point.
-            t (float): The t value.
+            t (float): The t value, or an array of t values to get every point at once.
 
         Returns:
             int: The cubic Bezier curve.
@@ -3,6 +3,7 @@ Grapher Class
 """
 
 import abc
+import numpy as np
 from ..curves import Curves
 
 
@@ -20,6 +21,7 @@ class Grapher(metaclass=abc.ABCMeta):
     Methods:
         plot(): Abstract method to plot the graph.
         save_plot(): Abstract method to save the plot to a file.
+        render(): Abstract method to render the plot to an array.
     """
 
     @classmethod
@@ -54,3 +56,13 @@ class Grapher(metaclass=abc.ABCMeta):
             NotImplementedError: This function is not implemented yet.
         """
         raise NotImplementedError
+
+    @abc.abstractmethod
+    def render(self, frame: int, curves: Curves, title: str, linspace: int = 50) -> np.ndarray:
+        """
+        Renders the plot to an array of RGB pixels, without saving it to a file.
+
+        Raises:
+            NotImplementedError: This function is not implemented yet.
+        """
+        raise NotImplementedError
@@ -3,6 +3,7 @@ Matplotlib Grapher Class
 """
 
 from fractions import Fraction
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 import matplotlib.path as mpath
@@ -20,6 +21,8 @@ class MatplotlibGrapher(Grapher):
         filename (str): The name of the file to save the graph.
         resolution (tuple): The resolution of the graph in pixels.
         dpi (int): The dots per inch (dpi) of the graph.
+        figure (Figure): The figure that every graph is drawn on.
+        ax (Axes): The axes of the figure.
 
     Methods:
         plot(frame: int, curves: Curves, linspace: int = 50) -> None:
@@ -27,6 +30,18 @@ class MatplotlibGrapher(Grapher):
 
         save_plot(frame: int, curves: Curves, output_dir: str, linspace: int = 50) -> None:
             Saves the current plot to a file in the specified output directory.
+
+        render(frame: int, curves: Curves, title: str, linspace: int = 50) -> np.ndarray:
+            Renders the plot to an array of RGB pixels.
+
+        draw(frame: int, curves: Curves, title: str) -> None:
+            Draws the curves on the axes of the figure.
+
+        reset() -> None:
+            Clears the axes, so that the figure can be reused for the next graph.
+
+        close() -> None:
+            Closes the figure.
     """
 
     def __init__(self, filename: str, resolution: tuple, dpi: int = 100):
@@ -34,11 +49,6 @@ class MatplotlibGrapher(Grapher):
         self.resolution = resolution
         self.dpi = dpi
 
-    def plot(self, frame: int, curves: Curves, title: str, linspace: int = 50):
-        """
-        This method is used to plot the graph.
-        It raises a NotImplementedError as it needs to be implemented in the derived class.
-        """
         simplified_resolution = Fraction(
             self.resolution[0], self.resolution[1])
         numerator, denominator = simplified_resolution.numerator, simplified_resolution.denominator
@@ -50,24 +60,15 @@ class MatplotlibGrapher(Grapher):
             numerator *= 1.5
             denominator *= 1.5
 
-        _, ax = plt.subplots(figsize=(numerator, denominator), dpi=self.dpi)
-        ax.set_title(title)
-        ax.set_xlabel(f"Frame: {frame}")
-        ax.set_xlim(0, self.resolution[0])
-        ax.set_ylim(0, self.resolution[1])
-
-        curves = curves.get_segments()
-        Path = mpath.Path
-        for curve in curves:
-            if len(curve) == 4:
-                path_curve = Path(
-                    curve, [Path.MOVETO, Path.CURVE4, Path.CURVE4, Path.CURVE4])
-            else:
-                path_curve = Path(curve, [Path.MOVETO, Path.LINETO])
-            path_patch = mpatches.PathPatch(
-                path_curve, aa=None, fc="none", ec=None, lw=0.5)
-            ax.add_patch(path_patch)
+        # Created once and reused for every graph, creating a figure costs more than drawing on it
+        self.figure, self.ax = plt.subplots(figsize=(numerator, denominator), dpi=self.dpi)
 
+    def plot(self, frame: int, curves: Curves, title: str, linspace: int = 50):
+        """
+        This method is used to plot the graph.
+        It raises a NotImplementedError as it needs to be implemented in the derived class.
+        """
+        self.draw(frame, curves, title)
         plt.show()
 
     def save_plot(self, frame: int, curves: Curves, output_dir: str, output_filename: str, title: str, linspace: int = 50):
@@ -80,34 +81,55 @@ class MatplotlibGrapher(Grapher):
         Raises:
             NotImplementedError: This function is not implemented yet.
         """
-        simplified_resolution = Fraction(
-            self.resolution[0], self.resolution[1])
-        numerator, denominator = simplified_resolution.numerator, simplified_resolution.denominator
-        while numerator > 10 or denominator > 10:
-            numerator /= 2
-            denominator /= 2
+        self.draw(frame, curves, title)
+        # The graphs are line art, which the fastest zlib level already compresses well
+        self.figure.savefig(f'{output_dir}/{output_filename}.png', pil_kwargs={'compress_level': 1})
 
-        while numerator < 5 or denominator < 5:
-            numerator *= 1.5
-            denominator *= 1.5
+    def render(self, frame: int, curves: Curves, title: str, linspace: int = 50) -> np.ndarray:
+        """
+        Renders the plot to an array, without saving it to a file.
 
-        _, ax = plt.subplots(figsize=(numerator, denominator), dpi=self.dpi)
+        Returns:
+            np.ndarray: The RGB pixels of the plot, of shape (height, width, 3).
+        """
+        self.draw(frame, curves, title)
+        self.figure.canvas.draw()
+        return np.ascontiguousarray(np.asarray(self.figure.canvas.buffer_rgba())[:, :, :3])
+
+    def draw(self, frame: int, curves: Curves, title: str):
+        """
+        Draws the curves on the axes of the figure, replacing the previous graph.
+
+        Args:
+            frame (int): The frame number shown below the graph.
+            curves (Curves): The curves to draw.
+            title (str): The title of the graph.
+        """
+        self.reset()
+        ax = self.ax
         ax.set_title(title)
         ax.set_xlabel(f"Frame: {frame}")
         ax.set_xlim(0, self.resolution[0])
         ax.set_ylim(0, self.resolution[1])
 
-        curves = curves.get_segments()
+        # Every segment goes into a single compound path, drawn by one patch instead of one patch per segment.
+        # The packed control points are used as the vertices of the path as they are, each segment as a cubic curve.
         Path = mpath.Path
-        for curve in curves:
-            if len(curve) == 4:
-                path_curve = Path(
-                    curve, [Path.MOVETO, Path.CURVE4, Path.CURVE4, Path.CURVE4])
-            else:
-                path_curve = Path(curve, [Path.MOVETO, Path.LINETO])
-            path_patch = mpatches.PathPatch(
-                path_curve, aa=None, fc="none", ec=None, lw=0.5)
-            ax.add_patch(path_patch)
-
-        plt.savefig(f'{output_dir}/{output_filename}.png')
-        plt.close()
+        control_points = curves.get_control_points()
+        codes = np.tile(np.array([Path.MOVETO, Path.CURVE4, Path.CURVE4, Path.CURVE4], dtype=Path.code_type),
+                        len(control_points))
+        path_patch = mpatches.PathPatch(
+            Path(control_points.reshape((-1, 2)), codes), aa=None, fc="none", ec=None, lw=0.5)
+        ax.add_patch(path_patch)
+
+    def reset(self):
+        """
+        Clears the axes of the figure, removing the previous graph, its title and labels.
+        """
+        self.ax.cla()
+
+    def close(self):
+        """
+        Closes the figure. The grapher cannot be used afterwards.
+        """
+        plt.close(self.figure)
@@ -2,15 +2,110 @@
 Image Class
 """
 
+import io
+import math
 import os
-from io import BytesIO
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import numpy as np
 import cv2
 import requests
-from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageFile, ImageOps
+from ..cpu import MAX_THREADS
 from .media import Media
 
+# Shared by every download, so that the connections to a host are kept alive and reused by the following images
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=16))
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16))
+# Shape of a pixel in the modes with 8-bit channels, which are converted and resized without going through PIL
+PIXEL_SHAPES = {"L": (), "RGB": (3,), "RGBA": (4,)}
+
+
+def decode_image(source, target_resolution: tuple = None) -> Image.Image:
+    """
+    Decodes an image file right away, so that the file is closed here instead of being kept open until it is used.
+
+    Args:
+        source (str | io.BytesIO): The filename or the content of the image file.
+        target_resolution (tuple): The smallest resolution (width, height) a JPEG image is decoded at, see
+            ImageMedia.__init__(). Defaults to None, the full resolution.
+
+    Returns:
+        PIL.Image.Image: The decoded image.
+    """
+    with Image.open(source) as image:
+        if target_resolution and image.format == "JPEG":
+            # Scaled down while decoding the DCT blocks, so that the full image is never decoded
+            image.draft("RGB", tuple(target_resolution))
+        image.load()
+    return image
+
+
+def decode_image_chunks(chunks, target_resolution: tuple = None) -> Image.Image:
+    """
+    Decodes an image file as its chunks are received, see decode_image().
+
+    Args:
+        chunks (iterable): The chunks of bytes of the image file.
+        target_resolution (tuple): The smallest resolution (width, height) a JPEG image is decoded at, see
+            ImageMedia.__init__(). Defaults to None, the full resolution.
+
+    Returns:
+        PIL.Image.Image: The decoded image.
+    """
+    if target_resolution:
+        # The size of a JPEG image can only be reduced before it starts being decoded, so the file is read in full
+        return decode_image(io.BytesIO(b"".join(chunks)), target_resolution)
+    parser = ImageFile.Parser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def rotated_crop_box(width: int, height: int, angle: float) -> tuple:
+    """
+    Returns the largest box of an image that is still fully covered by its pixels once ImageMedia.rotate() has
+    rotated it by the given angle around its center, with the resolution kept.
+
+    Args:
+        width (int): The width of the image.
+        height (int): The height of the image.
+        angle (float): The angle in degrees the image is rotated by.
+
+    Returns:
+        tuple: The box (left, top, right, bottom), in pixels of the rotated image.
+    """
+    if angle % 180 == 0:
+        return (0, 0, width, height)
+    if angle % 90 == 0:
+        # The same placement as the quarter turns of ImageMedia.rotate()
+        offset = (width - height + (int(angle // 90) % 4 == 3)) // 2
+        if width >= height:
+            return (offset, 0, offset + height, height)
+        return (0, -offset, width, width - offset)
+
+    sin_a = abs(math.sin(math.radians(angle)))
+    cos_a = abs(math.cos(math.radians(angle)))
+    if min(width, height) <= 2 * sin_a * cos_a * max(width, height) or abs(sin_a - cos_a) < 1e-10:
+        # Two opposite corners of the box touch the long sides of the rotated image
+        half_side = min(width, height) / 2
+        box_width, box_height = (half_side / sin_a, half_side / cos_a) if width >= height else \
+            (half_side / cos_a, half_side / sin_a)
+    else:
+        # The four corners of the box touch the sides of the rotated image
+        cos_2a = cos_a * cos_a - sin_a * sin_a
+        box_width = (width * cos_a - height * sin_a) / cos_2a
+        box_height = (height * cos_a - width * sin_a) / cos_2a
+
+    box_width = max(min(int(box_width), width), 1)
+    box_height = max(min(int(box_height), height), 1)
+    left, top = (width - box_width) // 2, (height - box_height) // 2
+    return (left, top, left + box_width, top + box_height)
+
 
 class ImageMedia(Media):
     """
@@ -21,67 +116,150 @@ class ImageMedia(Media):
         - filename (str): The filename of the image.
         - image (PIL.Image.Image): The image object.
         - resolution (tuple): The resolution of the image (width, height).
+        - numpy_array (np.ndarray): The pixels of the image, cached by to_numpy_array() until the image changes.
+        - grayscale_array (np.ndarray): The grayscale pixels of the image, cached by to_grayscale_array() until
+          the image changes.
 
     Methods:
-        - __init__(self, url=None, filename=None): Initializes the ImageMedia object.
+        - __init__(self, url=None, filename=None, array=None, target_resolution=None): Initializes the ImageMedia
+          object.
+        - batch_from_urls(cls, urls, max_workers=8) -> list: Downloads several images at once.
+        - simd_report() -> dict: Reports the CPU features OpenCV is built for.
         - __str__(self) -> str: Returns a string representation of the ImageMedia object.
         - to_numpy_array(self) -> np.ndarray: Converts the image object to a NumPy array.
-        - get_canny(self, low_threshold, high_threshold) -> np.ndarray: Applies Canny edge detection to the image.
+        - to_grayscale_array(self) -> np.ndarray: Converts the image object to a grayscale NumPy array.
+        - get_canny(self, low_threshold, high_threshold, l2_gradient) -> np.ndarray: Applies Canny edge detection to the image.
+        - canny_batch(images, low_threshold, high_threshold, l2_gradient) -> list: Applies Canny edge detection to
+          several images at once.
         - get_sobel(self) -> np.ndarray: Applies Sobel edge detection to the image.
         - resize_resolution(self, width: int, height: int) -> None: Resizes the image object to the specified resolution.
         - resize_scale(self, scale: float) -> None: Resizes the image object by the specified scale factor.
-        - rotate(self, angle: float) -> None: Rotates the image object by the specified angle.
+        - resize_to_max_dim(self, max_size: int) -> None: Scales the image object down to fit in max_size.
+        - rotate(self, angle: float, crop: bool) -> None: Rotates the image object by the specified angle.
         - change_format(self, new_format: str) -> None: Changes the format of the image object to the specified format.
         - convert_to_png(self) -> np.ndarray: Changes the image to a transparent PNG and only keeps the original subject.
     """
 
-    def __init__(self, url=None, filename=None):
+    __slots__ = ('image', 'numpy_array', 'grayscale_array')
+
+    def __init__(self, url=None, filename=None, array=None, target_resolution=None):
         """
         Initializes the ImageMedia object.
 
         Args:
             url (str): The URL of the image.
             filename (str): The filename of the image.
+            array (np.ndarray): The pixels of the image, as an RGB array of shape (height, width, 3).
+                The pixels are copied, the array can be reused once the object is created.
+            target_resolution (tuple): The smallest resolution (width, height) the image is needed at, when it will
+                be scaled down afterwards. A JPEG image is then decoded at the smallest of 1/2, 1/4 or 1/8 of its size
+                that is still at least this large on both sides, which the following resize finishes. The resolution
+                of the object is the decoded one. Images from a URL are then downloaded in full before being decoded,
+                instead of being decoded while they are downloaded.
 
         Raises:
-            ValueError: If neither url nor filename is provided.
+            ValueError: If neither url, filename nor array is provided.
+            ValueError: If target_resolution is not a pair of positive integers.
             ValueError: If the URL does not exist or is not accessible.
             ValueError: If the URL is not a valid image file.
             FileNotFoundError: If the file does not exist in the current directory.
         """
-        if not (url or filename):
-            raise ValueError("Either url or filename must be provided")
+        if not (url or filename or array is not None):
+            raise ValueError("Either url, filename or array must be provided")
+        if target_resolution is not None and not (
+                len(target_resolution) == 2 and
+                all(isinstance(size, int) and not isinstance(size, bool) and size > 0 for size in target_resolution)):
+            raise ValueError(f"Target resolution {target_resolution} must be a pair of positive integers")
 
         # Check if the file exists, if not, download from internet
         super().__init__(url, filename)
+        self.numpy_array = None
+        self.grayscale_array = None
         if url:
             try:
-                response = requests.get(url, allow_redirects=True, timeout=10)
+                # Streamed, so that the content type is checked on the headers, and the image is decoded while
+                # it is being downloaded, see decode_image_chunks()
+                response = SESSION.get(url, allow_redirects=True, timeout=10, stream=True)
             except requests.exceptions.ConnectionError as e:
                 raise ValueError(
                     f"URL {url} does not exist or is not accessible") from e
 
-            if not response.ok:
-                raise ValueError(
-                    f"URL {url} does not exist or is not accessible")
+            # The connection is released as soon as the image is read, or when it is rejected
+            with response:
+                if not response.ok:
+                    raise ValueError(
+                        f"URL {url} does not exist or is not accessible")
 
-            content_type = response.headers.get('content-type')
-            if 'image' not in content_type:
-                raise ValueError(
-                    f"URL {url} is not a valid image file")
+                content_type = response.headers.get('content-type', '')
+                if 'image' not in content_type:
+                    raise ValueError(
+                        f"URL {url} is not a valid image file")
 
-            self.image = Image.open(BytesIO(response.content))
+                self.image = decode_image_chunks(response.iter_content(chunk_size=64 * 1024), target_resolution)
+            self.resolution = self.image.size
+
+        elif array is not None:
+            # Flipped as a view, so that the pixels are only copied once, by fromarray
+            self.image = Image.fromarray(array[::-1])
             self.resolution = self.image.size
 
         else:
             if not os.path.isfile(filename):
                 raise FileNotFoundError(
                     f"File {filename} does not exist in the current directory")
-            self.image = Image.open(filename)
+            self.image = decode_image(filename, target_resolution)
             self.resolution = self.image.size
 
-        self.rotate(180)
-        self.flip_image()
+        # Images are graphed upside down, with their origin at the bottom left.
+        # Rotating by 180 degrees and mirroring is a single flip from top to bottom.
+        if array is None:
+            self.image = ImageOps.flip(self.image)
+
+    @classmethod
+    def batch_from_urls(cls, urls: list, max_workers: int = 8) -> list:
+        """
+        Downloads the images at the given URLs at once, on a pool of threads sharing the connections of SESSION.
+
+        Args:
+            urls (list): The URLs of the images.
+            max_workers (int): The largest number of images downloaded at the same time.
+
+        Returns:
+            list: The ImageMedia objects, in the order of urls.
+
+        Raises:
+            ValueError: If a URL does not exist, is not accessible or is not a valid image file.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda url: cls(url=url), urls))
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def simd_report() -> dict:
+        """
+        Reports the CPU features the OpenCV build used to resize the images and detect their edges is compiled for.
+
+        OpenCV builds differ between machines, the same code can be several times slower with a build that lacks
+        Intel IPP or the vector instructions of the CPU. The build information is only parsed once.
+
+        Returns:
+            dict: The report, with the keys:
+                - machine (str): The architecture of this machine, such as 'x86_64' or 'aarch64'.
+                - baseline (tuple): The CPU features all of OpenCV is compiled for.
+                - dispatched (tuple): The CPU features of the code paths OpenCV chooses at runtime on CPUs having them.
+                - ipp (str): The version of Intel IPP OpenCV is built with, or None if it is not.
+        """
+        report = {"machine": platform.machine(), "baseline": (), "dispatched": (), "ipp": None}
+        for line in cv2.getBuildInformation().splitlines():
+            key, _, value = line.partition(":")
+            match key.strip():
+                case "Baseline":
+                    report["baseline"] = tuple(value.split())
+                case "Dispatched code generation":
+                    report["dispatched"] = tuple(value.split())
+                case "Intel IPP":
+                    report["ipp"] = None if value.strip() in ("", "NO") else value.strip()
+        return report
 
     def __str__(self) -> str:
         """
@@ -96,25 +274,80 @@ class ImageMedia(Media):
         """
         Converts the image object to a NumPy array.
 
+        The array is cached, so that the image is only converted again once it is resized, rotated or flipped.
+        It is shared by the callers, so it is read-only. It is read from the image without copying it again.
+
         Returns:
             np.ndarray: The image object as a NumPy array.
         """
-        return np.array(self.image)
+        if self.numpy_array is None:
+            pixel_shape = PIXEL_SHAPES.get(self.image.mode)
+            if pixel_shape is None:
+                self.numpy_array = np.asarray(self.image)
+            else:
+                # A single copy of the pixels by tobytes(), without the array interface of PIL
+                width, height = self.image.size
+                self.numpy_array = np.frombuffer(self.image.tobytes(), dtype=np.uint8).reshape(
+                    (height, width, *pixel_shape))
+        return self.numpy_array
+
+    def to_grayscale_array(self) -> np.ndarray:
+        """
+        Converts the image object to a grayscale NumPy array.
 
-    def get_canny(self, low_threshold: int = 50, high_threshold: int = 150) -> np.ndarray:
+        The array is cached like the one of to_numpy_array(), so that Canny and Sobel share a single conversion.
+        It is shared by the callers, so it is read-only.
+
+        Returns:
+            np.ndarray: The image object as a single-channel NumPy array.
+        """
+        if self.grayscale_array is None:
+            src = self.to_numpy_array()
+            if src.ndim == 2:
+                self.grayscale_array = src
+            else:
+                self.grayscale_array = cv2.cvtColor(src, cv2.COLOR_RGB2GRAY)
+                self.grayscale_array.flags.writeable = False
+        return self.grayscale_array
+
+    def get_canny(self, low_threshold: int = 50, high_threshold: int = 150, l2_gradient: bool = False) -> np.ndarray:
         """
         Apply Canny edge detection to the image.
 
         Args:
             low_threshold (int): The lower threshold value for the hysteresis procedure.
             high_threshold (int): The higher threshold value for the hysteresis procedure.
+            l2_gradient (bool): Whether the gradient magnitude is the L2 norm, which finds more accurate edges at
+                a small cost, instead of the sum of the absolute x and y gradients. Defaults to False.
 
         Returns:
             np.ndarray: The resulting image after applying Canny edge detection.
         """
-        src = self.to_numpy_array()
-        src = cv2.GaussianBlur(src, (3, 3), 0)
-        return cv2.Canny(src, low_threshold, high_threshold)
+        # Converted to grayscale first, so that the blur and Canny go through a single channel
+        gray = cv2.GaussianBlur(self.to_grayscale_array(), (3, 3), 0)
+        return cv2.Canny(gray, low_threshold, high_threshold, L2gradient=l2_gradient)
+
+    @staticmethod
+    def canny_batch(images: list, low_threshold: int = 50, high_threshold: int = 150, l2_gradient: bool = False) -> list:
+        """
+        Applies Canny edge detection to several images at once, see get_canny().
+
+        OpenCV releases the GIL, so the images are processed on a pool of threads, one per CPU this process may run
+        on, which is started once for the whole batch. The number of threads of OpenCV itself is process-wide, so it
+        is left as it is: the workers of the video pool already run it single-threaded, see init_worker().
+
+        Args:
+            images (list): The ImageMedia objects.
+            low_threshold (int): The lower threshold value for the hysteresis procedure.
+            high_threshold (int): The higher threshold value for the hysteresis procedure.
+            l2_gradient (bool): Whether the gradient magnitude is the L2 norm. Defaults to False.
+
+        Returns:
+            list: The resulting images after applying Canny edge detection, in the order of images.
+        """
+        with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
+            return list(executor.map(lambda image: image.get_canny(low_threshold, high_threshold, l2_gradient),
+                                     images))
 
     def get_sobel(self) -> np.ndarray:
         """
@@ -123,34 +356,44 @@ class ImageMedia(Media):
         Returns:
             np.ndarray: The resulting image after applying Sobel edge detection.
         """
-        scale = 1
-        delta = 0
-        ddepth = cv2.CV_16S
+        # Converted to grayscale first, so that the blur and Sobel go through a single channel
+        gray = cv2.GaussianBlur(self.to_grayscale_array(), (3, 3), 0)
 
-        src = cv2.GaussianBlur(self.to_numpy_array(), (3, 3), 0)
-        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
-
-        grad_x = cv2.Sobel(gray, ddepth, 1, 0, ksize=3, scale=scale,
-                           delta=delta, borderType=cv2.BORDER_DEFAULT)
-        grad_y = cv2.Sobel(gray, ddepth, 0, 1, ksize=3, scale=scale,
-                           delta=delta, borderType=cv2.BORDER_DEFAULT)
+        # Both 3x3 Sobel gradients are computed in a single pass over the image, as 16-bit signed integers
+        grad_x, grad_y = cv2.spatialGradient(gray, ksize=3, borderType=cv2.BORDER_DEFAULT)
 
         abs_grad_x = cv2.convertScaleAbs(grad_x)
         abs_grad_y = cv2.convertScaleAbs(grad_y)
 
-        grad = cv2.addWeighted(abs_grad_x, 0.5, abs_grad_y, 0.5, 0)
+        # Combined into the buffer of abs_grad_x, instead of a third one
+        grad = cv2.addWeighted(abs_grad_x, 0.5, abs_grad_y, 0.5, 0, dst=abs_grad_x)
         return grad
 
     def resize_resolution(self, width: int, height: int) -> None:
         """
         Resizes the image object to the specified resolution.
 
+        Images with 8-bit channels are resized by OpenCV, which is faster than PIL, with area interpolation when
+        scaling down, as it does not alias, and bilinear interpolation when scaling up. Other images are resized
+        by PIL.
+
         Args:
             width (int): The new width of the image object.
             height (int): The new height of the image object.
         """
-        self.image = self.image.resize((width, height))
-        self.resolution = self.image.size
+        if self.image.mode in PIXEL_SHAPES:
+            interpolation = cv2.INTER_AREA if width * height < self.resolution[0] * self.resolution[1] else cv2.INTER_LINEAR
+            resized = cv2.resize(self.to_numpy_array(), (width, height), interpolation=interpolation)
+            resized.flags.writeable = False
+            self.image = Image.fromarray(resized)
+            self.resolution = self.image.size
+            self.numpy_array = resized
+            self.grayscale_array = None
+        else:
+            self.image = self.image.resize((width, height))
+            self.resolution = self.image.size
+            self.numpy_array = None
+            self.grayscale_array = None
 
     def resize_scale(self, scale: float) -> None:
         """
@@ -159,19 +402,76 @@ class ImageMedia(Media):
         Args:
             scale (float): The scale factor to resize the image object.
         """
-        self.image = self.image.resize(
-            (int(self.resolution[0] * scale), int(self.resolution[1] * scale)))
-        self.resolution = self.image.size
+        self.resize_resolution(int(self.resolution[0] * scale), int(self.resolution[1] * scale))
 
-    def rotate(self, angle: float) -> None:
+    def resize_to_max_dim(self, max_size: int) -> None:
         """
-        Rotates the image object by the specified angle.
+        Scales the image object down in a single resize, so that its largest side is at most max_size.
+
+        The image keeps its aspect ratio, and is left as is if it already fits.
+
+        Args:
+            max_size (int): The largest size, in pixels, of the sides of the image object.
+        """
+        largest_side = max(self.resolution)
+        if largest_side <= max_size:
+            return
+        scale = max_size / largest_side
+        self.resize_resolution(int(self.resolution[0] * scale), int(self.resolution[1] * scale))
+
+    def rotate(self, angle: float, crop: bool = False) -> None:
+        """
+        Rotates the image object counterclockwise by the specified angle, around its center.
+
+        The image keeps its resolution, the corners rotated out of it are cut and the uncovered areas are black.
+        Right angle rotations of images with 8-bit channels are exact pixel moves done by OpenCV, with the same
+        result as PIL, other rotations are done by PIL, with nearest neighbour resampling, whether cropped or not.
 
         Args:
             angle (float): The angle in degrees to rotate the image object.
+            crop (bool): Whether to cut the image down to the largest box its rotated pixels fully cover, see
+                rotated_crop_box(). The borders of the black areas are not detected as edges, and fewer pixels are
+                processed. Defaults to False.
         """
-        self.image = self.image.rotate(angle)
+        quarter_turns = int(angle // 90) % 4 if angle % 90 == 0 else None
+        if quarter_turns == 0:
+            return
+        width, height = self.resolution
+        left, top, right, bottom = rotated_crop_box(width, height, angle) if crop else (0, 0, width, height)
+
+        if quarter_turns is not None and self.image.mode in PIXEL_SHAPES:
+            array = self.to_numpy_array()
+            match quarter_turns:
+                case 1:
+                    rotated = cv2.rotate(array, cv2.ROTATE_90_COUNTERCLOCKWISE)
+                case 2:
+                    rotated = cv2.rotate(array, cv2.ROTATE_180)
+                case 3:
+                    rotated = cv2.rotate(array, cv2.ROTATE_90_CLOCKWISE)
+            if quarter_turns != 2:
+                # Centered back on the canvas of the image, rounded the way PIL places the pixels
+                offset = (width - height + (quarter_turns == 3)) // 2
+                canvas = np.zeros_like(array)
+                if width >= height:
+                    canvas[:, offset:offset + height] = rotated[offset:offset + height]
+                else:
+                    canvas[-offset:width - offset] = rotated[:, -offset:width - offset]
+                rotated = canvas
+            rotated = np.ascontiguousarray(rotated[top:bottom, left:right])
+        else:
+            self.image = self.image.rotate(angle)
+            if crop:
+                self.image = self.image.crop((left, top, right, bottom))
+            self.resolution = self.image.size
+            self.numpy_array = None
+            self.grayscale_array = None
+            return
+
+        rotated.flags.writeable = False
+        self.image = Image.fromarray(rotated)
         self.resolution = self.image.size
+        self.numpy_array = rotated
+        self.grayscale_array = None
 
     def flip_image(self) -> None:
         """
@@ -184,6 +484,8 @@ class ImageMedia(Media):
         """
         self.image = ImageOps.mirror(self.image)
         self.resolution = self.image.size
+        self.numpy_array = None
+        self.grayscale_array = None
 
     def change_format(self, new_format: str) -> None:
         """
@@ -16,6 +16,9 @@ class Media(metaclass=abc.ABCMeta):
         - resolution: The resolution of the media (None by default).
     """
 
+    # Subclasses declare their own attributes in __slots__ too, so that no media object carries a __dict__
+    __slots__ = ('url', 'filename', 'resolution')
+
     @classmethod
     def __subclasshook__(cls, subclass):
         return (hasattr(subclass, 'load_data_source') and
@@ -57,13 +60,14 @@ class Media(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_canny(self, low_threshold, high_threshold) -> np.ndarray:
+    def get_canny(self, low_threshold, high_threshold, l2_gradient=False) -> np.ndarray:
         """
         Apply Canny edge detection to the image.
 
         Args:
             low_threshold (int): The lower threshold value for the hysteresis procedure.
             high_threshold (int): The higher threshold value for the hysteresis procedure.
+            l2_gradient (bool): Whether the gradient magnitude is the L2 norm instead of the L1 norm.
 
         Returns:
             np.ndarray: The resulting image after applying Canny edge detection.
@@ -102,12 +106,24 @@ class Media(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def rotate(self, angle: float) -> None:
+    def resize_to_max_dim(self, max_size: int) -> None:
+        """
+        Scales the media object down, so that its largest side is at most max_size.
+
+        Args:
+            max_size (int): The largest size, in pixels, of the sides of the media object.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def rotate(self, angle: float, crop: bool = False) -> None:
         """
         Rotates the media object by the specified angle.
 
         Args:
             angle (float): The angle in degrees to rotate the media object.
+            crop (bool): Whether to cut the media object down to the largest box its rotated pixels fully cover.
+                Defaults to False.
         """
         raise NotImplementedError
 
@@ -2,6 +2,7 @@
 Tests for the curves module.
 """
 
+from types import SimpleNamespace
 import pytest
 import numpy as np
 import potrace
@@ -36,6 +37,36 @@ def sample_curves(sample_image):
     return Curves(sample_image)
 
 
+class PathCurve(list):
+    """A closed curve of a potrace path: its segments, starting at start_point."""
+
+    def __init__(self, start_point, segments):
+        super().__init__(segments)
+        self.start_point = start_point
+
+
+@pytest.fixture
+def known_curves():
+    """
+    Create a Curves object whose path is known, with both corners and curves.
+
+    Returns:
+    Curves: The Curves object, with a path of two closed curves.
+    """
+    curves = Curves(ImageMedia(array=np.zeros((8, 8, 3), dtype=np.uint8)))
+    curves.path = [
+        PathCurve((10.0, 20.0), [
+            SimpleNamespace(is_corner=True, c=(40.5, 22.0), end_point=(45.0, 60.25)),
+            SimpleNamespace(is_corner=False, c1=(30.0, 90.0), c2=(5.0, 70.0), end_point=(10.0, 20.0)),
+        ]),
+        PathCurve((100.0, 100.0), [
+            SimpleNamespace(is_corner=False, c1=(130.0, 95.0), c2=(150.0, 140.0), end_point=(120.0, 160.0)),
+            SimpleNamespace(is_corner=True, c=(90.0, 150.0), end_point=(100.0, 100.0)),
+        ]),
+    ]
+    return curves
+
+
 @pytest.mark.parametrize("algorithm", ["Canny", "Sobel"])
 def test_curves_init(sample_image, algorithm):
     """
@@ -156,3 +187,34 @@ def test_get_coordinates(sample_curves):
                for coordinate in coordinates for values in coordinate)
     assert all(isinstance(value, float)
                for coordinate in coordinates for values in coordinate for value in values)
+
+
+@pytest.mark.parametrize("linspace", [2, 50])
+def test_get_coordinates_values(known_curves, linspace):
+    """
+    Test that the coordinates are the points of the segments, as evaluated one at a time by linear_bezier_curve for
+    the lines of the corners, and by cubic_bezier_curve for the curves.
+
+    Parameters:
+    - known_curves: An instance of the Curves object, with a known path.
+    - linspace: The number of points along each segment.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If a segment is missing, or one of its points is not on the segment.
+    """
+    segments = known_curves.get_segments()
+    coordinates = known_curves.get_coordinates(linspace)
+    assert len(coordinates) == len(segments)
+    assert any(len(segment) == 2 for segment in segments) and any(len(segment) == 4 for segment in segments)
+
+    for segment, values in zip(segments, coordinates):
+        for axis in (0, 1):
+            points = [point[axis] for point in segment]
+            if len(points) == 2:
+                expected = [known_curves.linear_bezier_curve(*points, t) for t in np.linspace(0, 1, linspace)]
+            else:
+                expected = [known_curves.cubic_bezier_curve(*points, t) for t in np.linspace(0, 1, linspace)]
+            np.testing.assert_allclose(values[axis], expected, atol=1e-4)
@@ -5,10 +5,11 @@ Testing the image module.
 import os
 import pytest
 import numpy as np
-from mediagrapher.media.image import ImageMedia
+import cv2
+from mediagrapher.media.image import ImageMedia, rotated_crop_box
 
 
-TEST_IMAGE_DIR = os.path.join("src", "tests", "test_images")
+TEST_IMAGE_DIR = os.path.join(os.path.dirname(__file__), "test_images")
 
 
 @pytest.fixture
@@ -47,6 +48,49 @@ def test_image_file_does_not_exist():
         ImageMedia(filename="non_existent_file.jpg")
 
 
+@pytest.mark.parametrize("target_resolution", [(100, 100), (40, 30), (300, 300)])
+def test_image_file_target_resolution(sample_filename, target_resolution):
+    """
+    Test that a JPEG file is decoded at a reduced size that still covers the target resolution.
+
+    Parameters:
+    - sample_filename (str): The filename of the sample JPEG image.
+    - target_resolution (tuple): The resolution the image will be scaled down to.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If the decoded image is smaller than the target, or was reduced while it could not be.
+    """
+    full_resolution = ImageMedia(filename=sample_filename).resolution
+    image = ImageMedia(filename=sample_filename, target_resolution=target_resolution)
+
+    assert image.resolution[0] >= min(target_resolution[0], full_resolution[0])
+    assert image.resolution[1] >= min(target_resolution[1], full_resolution[1])
+    assert image.to_numpy_array().shape[:2] == image.resolution[::-1]
+    if target_resolution[0] * 2 > full_resolution[0]:
+        assert image.resolution == full_resolution
+    else:
+        assert image.resolution[0] < full_resolution[0]
+
+
+@pytest.mark.parametrize("target_resolution", [(100, 0), (-1, 100), (100.5, 100), (100,), (True, 100)])
+def test_image_file_target_resolution_invalid(sample_filename, target_resolution):
+    """
+    Test that a target resolution that is not a pair of positive integers is rejected.
+
+    Parameters:
+    - sample_filename (str): The filename of the sample JPEG image.
+    - target_resolution (tuple): The invalid target resolution.
+
+    Returns:
+    - None
+    """
+    with pytest.raises(ValueError):
+        ImageMedia(filename=sample_filename, target_resolution=target_resolution)
+
+
 def test_image_url_is_invalid():
     """
     Test the ImageMedia class when the image url does not exist.
@@ -58,6 +102,33 @@ def test_image_url_is_invalid():
         ImageMedia(url="https://non_existent_url.jpg")
 
 
+def test_batch_from_urls(sample_image_url):
+    """
+    Test the batch_from_urls method of the ImageMedia class.
+
+    Args:
+        sample_image_url (str): The URL of a sample image.
+
+    Returns:
+        None
+    """
+    images = ImageMedia.batch_from_urls([sample_image_url] * 3)
+    assert len(images) == 3
+    assert all(isinstance(image, ImageMedia) for image in images)
+    assert all(image.url == sample_image_url for image in images)
+
+
+def test_batch_from_urls_invalid():
+    """
+    Test the batch_from_urls method of the ImageMedia class when one of the urls does not exist.
+
+    Returns:
+        None
+    """
+    with pytest.raises(ValueError):
+        ImageMedia.batch_from_urls(["https://non_existent_url.jpg"])
+
+
 def test_image_media_str_representation(sample_image):
     """
     Test the string representation of the ImageMedia class.
@@ -117,6 +188,31 @@ def test_resize_scale(sample_image, scale_factor):
     assert new_resolution[1] == int(original_resolution[1] * scale_factor)
 
 
+@pytest.mark.parametrize("max_size", [100, 1000])
+def test_resize_to_max_dim(sample_image, max_size):
+    """
+    Test the resize_to_max_dim method of the SampleImage class.
+
+    Parameters:
+    - sample_image (SampleImage): The sample image object to be tested.
+    - max_size (int): The largest size of the sides of the image.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If the image does not fit in max_size, or was scaled down while it already fit.
+    """
+
+    original_resolution = sample_image.resolution
+    sample_image.resize_to_max_dim(max_size)
+    new_resolution = sample_image.resolution
+
+    assert max(new_resolution) <= max_size
+    if max(original_resolution) <= max_size:
+        assert new_resolution == original_resolution
+
+
 @pytest.mark.parametrize("angle", [90, 180, 270])
 def test_rotate(sample_image, angle):
     """
@@ -142,6 +238,80 @@ def test_rotate(sample_image, angle):
         assert new_resolution == original_resolution
 
 
+@pytest.mark.parametrize("angle", [90, 180, 270, -90])
+@pytest.mark.parametrize("shape", [(4, 7, 3), (7, 4, 3), (5, 4, 3), (5, 8), (6, 6, 4)])
+def test_rotate_right_angle(angle, shape):
+    """
+    Test that right angle rotations give the same pixels as PIL, on images with sides of both parities.
+
+    Parameters:
+    - angle: The angle in degrees by which to rotate the image.
+    - shape: The shape of the pixels of the image.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If the rotated pixels or resolution differ from the ones given by PIL.
+    """
+    pixels = np.random.default_rng(0).integers(1, 256, shape, dtype=np.uint8)
+    image = ImageMedia(array=pixels)
+    expected = image.image.rotate(angle)
+    image.rotate(angle)
+
+    assert image.resolution == expected.size
+    assert np.array_equal(image.to_numpy_array(), np.asarray(expected))
+
+
+@pytest.mark.parametrize("angle", [10, 45, 90, 200])
+@pytest.mark.parametrize("mode", ["RGB", "I"])
+def test_rotate_crop(angle, mode):
+    """
+    Test that cropped rotations leave no black area in the image.
+
+    Parameters:
+    - angle: The angle in degrees by which to rotate the image.
+    - mode: The mode of the image, "I" is rotated by PIL.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If the image is larger than before, or has black pixels.
+    """
+    image = ImageMedia(array=np.full((200, 300, 3), 255, dtype=np.uint8))
+    image.image = image.image.convert(mode)
+    image.rotate(angle, crop=True)
+
+    assert image.resolution[0] <= 300 and image.resolution[1] <= 200
+    assert np.asarray(image.image).min() > 0
+
+
+@pytest.mark.parametrize("angle", [10, 33.3, 45, 90, 200, 270])
+@pytest.mark.parametrize("shape", [(200, 300, 3), (301, 200), (50, 50, 4)])
+def test_rotate_crop_matches_pil(angle, shape):
+    """
+    Test that cropped rotations give the pixels of the PIL rotation, cropped to the same box.
+
+    Parameters:
+    - angle: The angle in degrees by which to rotate the image.
+    - shape: The shape of the pixels of the image.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If the rotated pixels differ from the ones of PIL.
+    """
+    pixels = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    image = ImageMedia(array=pixels)
+    expected = image.image.rotate(angle).crop(rotated_crop_box(*image.resolution, angle))
+    image.rotate(angle, crop=True)
+
+    assert image.resolution == expected.size
+    assert np.array_equal(image.to_numpy_array(), np.asarray(expected))
+
+
 def test_get_canny(sample_image):
     """
     Test the get_canny method of the sample_image object.
@@ -160,6 +330,46 @@ def test_get_canny(sample_image):
     assert isinstance(canny_result, np.ndarray)
 
 
+def test_get_canny_l2_gradient(sample_image):
+    """
+    Test the get_canny method of the sample_image object with the L2 gradient magnitude.
+
+    Parameters:
+    - sample_image: An instance of the SampleImage class.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If the result of get_canny is not an edge image of the size of the image.
+    """
+    canny_result = sample_image.get_canny(50, 150, l2_gradient=True)
+    assert isinstance(canny_result, np.ndarray)
+    assert canny_result.shape == (sample_image.resolution[1], sample_image.resolution[0])
+
+
+def test_canny_batch():
+    """
+    Test that canny_batch gives the same edges as get_canny on each image, in order.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If an edge image of the batch differs from the one of get_canny.
+    """
+    rng = np.random.default_rng(0)
+    images = [ImageMedia(array=rng.integers(0, 256, (40 + i, 60, 3), dtype=np.uint8)) for i in range(5)]
+
+    opencv_threads = cv2.getNumThreads()
+    batch = ImageMedia.canny_batch(images, 50, 150)
+
+    assert cv2.getNumThreads() == opencv_threads
+    assert len(batch) == len(images)
+    for image, edges in zip(images, batch):
+        assert np.array_equal(edges, image.get_canny(50, 150))
+
+
 def test_get_sobel(sample_image):
     """
     Test the get_sobel() method of the SampleImage class.
@@ -172,3 +382,21 @@ def test_get_sobel(sample_image):
     """
     sobel_result = sample_image.get_sobel()
     assert isinstance(sobel_result, np.ndarray)
+
+
+def test_simd_report():
+    """
+    Test that simd_report describes the OpenCV build.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If a key of the report is missing or has the wrong type.
+    """
+    report = ImageMedia.simd_report()
+
+    assert isinstance(report["machine"], str)
+    assert isinstance(report["baseline"], tuple)
+    assert isinstance(report["dispatched"], tuple)
+    assert report["ipp"] is None or isinstance(report["ipp"], str)
@@ -0,0 +1,230 @@
+"""
+Tests for the video functions of the main program.
+"""
+
+import io
+import os
+import sys
+import shutil
+import subprocess
+import importlib.util
+from types import SimpleNamespace
+import pytest
+import numpy as np
+
+# The main program is a script next to the mediagrapher package, of the same name
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "mediagrapher.py")
+SPEC = importlib.util.spec_from_file_location("mediagrapher_script", SCRIPT_PATH)
+mediagrapher_script = importlib.util.module_from_spec(SPEC)
+# Registered, so that the forked pool workers can unpickle the tasks of process_video()
+sys.modules[SPEC.name] = mediagrapher_script
+SPEC.loader.exec_module(mediagrapher_script)
+HAS_FFMPEG = bool(shutil.which("ffmpeg") and shutil.which("ffprobe"))
+
+
+class ShortReadStream(io.BytesIO):
+    """A binary stream that returns at most a few bytes per read, like a pipe."""
+
+    def __init__(self, data: bytes, max_read: int):
+        super().__init__(data)
+        self.max_read = max_read
+
+    def readinto(self, buffer) -> int:
+        """Reads at most max_read bytes into the buffer."""
+        return super().readinto(memoryview(buffer)[:self.max_read])
+
+
+@pytest.mark.parametrize("resolution, total_frames, threads", [
+    ((320, 240), 20, 2),
+    ((1920, 1080), 100000, 4),
+    ((4000, 4000), 100000, 1),
+])
+def test_frame_buffer_shape(resolution, total_frames, threads):
+    """
+    Test that the frame buffer has two slots per worker, at the traced resolution, and fits in MAX_FRAME_BUFFER_SIZE.
+
+    Parameters:
+    - resolution (tuple): The resolution of the video.
+    - total_frames (int): The number of frames of the video.
+    - threads (int): The number of worker processes.
+
+    Returns:
+    - None
+    """
+    metadata = {'width': resolution[0], 'height': resolution[1], 'total_frames': total_frames}
+    slots, chunk, height, width, channels = mediagrapher_script.frame_buffer_shape(metadata, threads)
+
+    assert slots == threads * 2
+    assert (width, height, channels) == (*mediagrapher_script.fit_resolution(resolution), 3)
+    assert 1 <= chunk <= -(-total_frames // (threads * 4))
+    assert slots * chunk * height * width * channels <= mediagrapher_script.MAX_FRAME_BUFFER_SIZE
+
+
+@pytest.mark.parametrize("max_read", [1, 7, 1000])
+@pytest.mark.parametrize("frame_count", [0, 2, 3, 5])
+def test_read_video_frames(max_read, frame_count):
+    """
+    Test that whole frames are read through short reads, until the array is full or the stream ends.
+
+    Parameters:
+    - max_read (int): The largest number of bytes returned by a read of the stream.
+    - frame_count (int): The number of whole frames in the stream, which also ends with part of a frame.
+
+    Returns:
+    - None
+    """
+    pixels = np.random.default_rng(0).integers(0, 256, (6, 4, 5, 3), dtype=np.uint8)
+    stream = ShortReadStream(pixels[:frame_count].tobytes() + pixels[frame_count].tobytes()[:10], max_read)
+    frames = np.zeros((3, 4, 5, 3), dtype=np.uint8)
+
+    count = mediagrapher_script.read_video_frames(stream, frames)
+
+    assert count == min(frame_count, 3)
+    assert np.array_equal(frames[:count], pixels[:count])
+
+
+def test_write_graphed_frames():
+    """
+    Test that graphed ranges are written in order, and that a range waits for the gap before it to be filled.
+
+    Returns:
+    - None
+    """
+    graphed = [np.full((2, 2, 3), frame, dtype=np.uint8) for frame in range(1, 7)]
+    # Stands in for the encoder process, recording the frames written to its stdin
+    encoder = SimpleNamespace(stdin=io.BytesIO())
+    free_slots = []
+    finished = {4: (1, graphed[3:5]), 6: (2, graphed[5:])}
+
+    next_frame = mediagrapher_script.write_graphed_frames(encoder, finished, 1, free_slots)
+    assert next_frame == 1
+    assert not encoder.stdin.getvalue() and not free_slots
+
+    finished[1] = (0, graphed[:3])
+    next_frame = mediagrapher_script.write_graphed_frames(encoder, finished, next_frame, free_slots)
+    assert next_frame == 7
+    assert not finished
+    assert free_slots == [0, 1, 2]
+    assert encoder.stdin.getvalue() == b"".join(frame.tobytes() for frame in graphed)
+
+
+@pytest.mark.parametrize("video_info, expected", [
+    ({}, 0),
+    ({"side_data_list": [{"side_data_type": "Display Matrix", "rotation": -90}]}, 270),
+    ({"side_data_list": [{"side_data_type": "Display Matrix", "rotation": 180}]}, 180),
+    ({"tags": {"rotate": "90"}}, 90),
+])
+def test_get_video_rotation(video_info, expected):
+    """
+    Test that the rotation is read from the display matrix, or from the rotate tag of older ffprobe versions.
+
+    Parameters:
+    - video_info (dict): The video stream, as probed by ffprobe.
+    - expected (int): The expected rotation in degrees.
+
+    Returns:
+    - None
+    """
+    assert mediagrapher_script.get_video_rotation(video_info) == expected
+
+
+def test_get_video_metadata_format_duration(monkeypatch):
+    """
+    Test that the duration of the container is used when the video stream does not record one, as in Matroska.
+
+    Parameters:
+    - monkeypatch: Used to replace ffprobe.
+
+    Returns:
+    - None
+    """
+    probe = {
+        'streams': [{'codec_type': 'video', 'codec_name': 'vp9', 'width': 64, 'height': 32,
+                     'avg_frame_rate': '25/1'}],
+        'format': {'duration': '2.000000'},
+    }
+    monkeypatch.setattr(mediagrapher_script.ffmpeg, "probe", lambda video_path: probe)
+
+    metadata = mediagrapher_script.get_video_metadata("video.mkv")
+
+    assert metadata['duration'] == 2.0
+    assert metadata['total_frames'] == 50
+
+
+@pytest.mark.skipif(not HAS_FFMPEG, reason="ffmpeg is not installed")
+@pytest.mark.parametrize("rotation", [0, 90, 270])
+def test_get_video_metadata_rotated(tmp_path, rotation):
+    """
+    Test that the resolution of a video recorded in portrait is the resolution of its decoded frames.
+
+    Parameters:
+    - tmp_path: A temporary directory for the video.
+    - rotation (int): The display rotation of the video, in degrees.
+
+    Returns:
+    - None
+
+    Raises:
+    - AssertionError: If the resolution differs from the one of the frames decoded by ffmpeg.
+    """
+    coded_path = os.path.join(tmp_path, "coded.mp4")
+    video_path = os.path.join(tmp_path, "video.mp4")
+    subprocess.run(["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=64x32:rate=10", "-t", "1",
+                    "-pix_fmt", "yuv420p", coded_path], check=True)
+    subprocess.run(["ffmpeg", "-loglevel", "error", "-display_rotation", str(rotation), "-i", coded_path,
+                    "-c", "copy", video_path], check=True)
+
+    metadata = mediagrapher_script.get_video_metadata(video_path)
+    frames = subprocess.run(["ffmpeg", "-loglevel", "error", "-i", video_path, "-frames:v", "1",
+                             "-f", "rawvideo", "-pix_fmt", "rgb24", "-"], check=True, capture_output=True).stdout
+
+    assert (metadata['width'], metadata['height']) == ((32, 64) if rotation % 180 else (64, 32))
+    assert len(frames) == metadata['width'] * metadata['height'] * 3
+
+
+@pytest.mark.skipif(not HAS_FFMPEG, reason="ffmpeg is not installed")
+@pytest.mark.skipif(sys.platform != "linux", reason="the pool workers only find this module when they are forked")
+def test_process_video(tmp_path, monkeypatch):
+    """
+    Test that every frame of a generated video is graphed into the output video.
+
+    Parameters:
+    - tmp_path: A temporary directory, the working directory of the test.
+    - monkeypatch: Used to change the working directory.
+
+    Returns:
+    - None
+    """
+    monkeypatch.chdir(tmp_path)
+    subprocess.run(["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=64x48:rate=10",
+                    "-f", "lavfi", "-i", "sine=frequency=440", "-t", "1.2", "-pix_fmt", "yuv420p", "-shortest",
+                    "video.mp4"], check=True)
+
+    try:
+        mediagrapher_script.process_video("video.mp4", "graphed", 2)
+    finally:
+        mediagrapher_script.shutdown_pool()
+
+    metadata = mediagrapher_script.get_video_metadata(os.path.join("output", "graphed.mp4"))
+    assert metadata['total_frames'] == 12
+
+
+@pytest.mark.skipif(not HAS_FFMPEG, reason="ffmpeg is not installed")
+def test_process_video_invalid(tmp_path, monkeypatch):
+    """
+    Test that a video that cannot be decoded raises an error instead of producing no output silently.
+
+    Parameters:
+    - tmp_path: A temporary directory, the working directory of the test.
+    - monkeypatch: Used to change the working directory.
+
+    Returns:
+    - None
+    """
+    monkeypatch.chdir(tmp_path)
+    with open("video.mp4", "wb") as file:
+        file.write(b"\x00\x00\x00\x18ftypmp42" + bytes(100))
+
+    with pytest.raises((ValueError, mediagrapher_script.ffmpeg.Error)):
+        mediagrapher_script.process_video("video.mp4", "graphed", 1)
+    assert not os.path.exists(os.path.join("output", "graphed.mp4"))